@@ -0,0 +1,200 @@
+"""ANN Index - Inverted-file (IVF) approximate search over a VectorStore.
+
+Rows are assigned to the nearest of `nlist` k-means centroids. A query scores
+the centroids, then only the rows of the `nprobe` closest lists. Files live
+next to the store they index:
+    ivf.json           nlist, dim, rows indexed, rows the centroids were trained on
+    ivf_centroids.f32  nlist x dim unit-length centroids
+    ivf_lists.i32      list id of each indexed row (append-only)
+
+Rows appended to the store after the last update() are scored exactly, so
+results never miss new data. Deleted rows are filtered out at query time and
+purged rows keep list id -1.
+"""
+
+import json
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from vector_store import (
+    LOCK_FILE,
+    VectorStore,
+    _append_array,
+    _file_lock,
+    _group_rows,
+    _remove_paths,
+    _stat_fingerprint,
+    _write_json_atomic,
+    normalize_rows,
+    top_k_indices,
+)
+
+IVF_MANIFEST_FILE = "ivf.json"
+IVF_CENTROIDS_FILE = "ivf_centroids.f32"
+IVF_LISTS_FILE = "ivf_lists.i32"
+
+MIN_TRAIN_ROWS = 1024       # Below this, exact search is just as fast
+RETRAIN_GROWTH = 4          # Retrain once the store is this many times larger
+KMEANS_ITERATIONS = 10
+SAMPLE_PER_LIST = 64
+ASSIGN_BATCH = 65536
+
+
+def _kmeans(data: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on unit-length rows. Returns unit-length centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, data)
+        empty = np.bincount(assignment, minlength=nlist) == 0
+        # Re-seed empty lists with random rows so every list stays useful
+        sums[empty] = data[rng.choice(len(data), int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFIndex:
+    """Approximate nearest-neighbour index layered on a VectorStore."""
+
+    def __init__(self, store: VectorStore, nprobe: int = 32):
+        self.store = store
+        self.nprobe = nprobe
+        self.nlist = 0
+        self.count = 0
+        self.trained_count = 0
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[np.ndarray] = []
+        self._fingerprint = None
+
+    @property
+    def path(self):
+        return self.store.path
+
+    def _read_manifest(self) -> dict:
+        manifest_path = self.path / IVF_MANIFEST_FILE
+        if not manifest_path.exists():
+            return {}
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def refresh(self):
+        """Reload centroids and inverted lists if the index changed on disk."""
+        fingerprint = _stat_fingerprint(self.path / IVF_MANIFEST_FILE)
+        if fingerprint == self._fingerprint:
+            return
+        self._fingerprint = fingerprint
+
+        manifest = self._read_manifest()
+        self.nlist = manifest.get("nlist", 0)
+        self.count = manifest.get("count", 0)
+        self.trained_count = manifest.get("trained_count", 0)
+        if not self.nlist or not self.count:
+            self.centroids = None
+            self.lists = []
+            return
+
+        self.centroids = np.fromfile(self.path / IVF_CENTROIDS_FILE, dtype=np.float32).reshape(self.nlist, -1)
+        assignment = np.fromfile(self.path / IVF_LISTS_FILE, dtype=np.int32, count=self.count)
+        # Purged rows (list -1) belong to no list
+        self.lists = _group_rows(assignment, self.nlist)
+
+    # ---------- Building ----------
+
+    def update(self) -> dict:
+        """Index rows appended since the last update, retraining when the store has grown."""
+        self.store.refresh()
+        with _file_lock(self.path / LOCK_FILE):
+            manifest = self._read_manifest()
+            count = manifest.get("count", 0)
+            trained_count = manifest.get("trained_count", 0)
+            total = len(self.store)
+
+            if self.store.live_count < MIN_TRAIN_ROWS:
+                self._remove_files()
+                status = {"status": "exact", "rows": total}
+            elif count > total or not trained_count or total >= trained_count * RETRAIN_GROWTH:
+                status = self._train(total)
+            elif count < total:
+                status = self._append(manifest, count, total)
+            else:
+                status = {"status": "current", "rows": total}
+        self.refresh()
+        return status
+
+    def _assign(self, centroids: np.ndarray, start: int, stop: int) -> np.ndarray:
+        assignment = np.full(stop - start, -1, dtype=np.int32)
+        for offset in range(start, stop, ASSIGN_BATCH):
+            rows, block = self.store.embedding_block(offset, min(offset + ASSIGN_BATCH, stop))
+            if len(rows):
+                assignment[rows - start] = np.argmax(block @ centroids.T, axis=1)
+        return assignment
+
+    def _train(self, total: int) -> dict:
+        live_rows = self.store.stored_rows(0, total)
+        live_rows = live_rows[~self.store.is_deleted(live_rows)]
+        nlist = int(min(4096, max(8, np.sqrt(len(live_rows)))))
+        rng = np.random.default_rng(0)
+        sample_size = min(len(live_rows), nlist * SAMPLE_PER_LIST)
+        sample_rows = np.sort(rng.choice(live_rows, sample_size, replace=False))
+        centroids = _kmeans(self.store.embedding_rows(sample_rows), nlist)
+        assignment = self._assign(centroids, 0, total)
+
+        for name, array in ((IVF_CENTROIDS_FILE, centroids), (IVF_LISTS_FILE, assignment)):
+            tmp_path = self.path / (name + ".tmp")
+            array.tofile(tmp_path)
+            os.replace(tmp_path, self.path / name)
+        _write_json_atomic(self.path / IVF_MANIFEST_FILE, {
+            "nlist": nlist,
+            "dim": self.store.dim,
+            "count": total,
+            "trained_count": total,
+        })
+        return {"status": "trained", "rows": total, "nlist": nlist}
+
+    def _append(self, manifest: dict, count: int, total: int) -> dict:
+        nlist = manifest["nlist"]
+        centroids = np.fromfile(self.path / IVF_CENTROIDS_FILE, dtype=np.float32).reshape(nlist, -1)
+        assignment = self._assign(centroids, count, total)
+
+        _append_array(self.path / IVF_LISTS_FILE, assignment, count)
+        _write_json_atomic(self.path / IVF_MANIFEST_FILE, {**manifest, "count": total})
+        return {"status": "appended", "rows": total, "added": total - count}
+
+    def _remove_files(self):
+        _remove_paths(*(self.path / name for name in (IVF_MANIFEST_FILE, IVF_CENTROIDS_FILE, IVF_LISTS_FILE)))
+
+    def clear(self):
+        """Drop the index (e.g. after the store was cleared)."""
+        with _file_lock(self.path / LOCK_FILE):
+            self._remove_files()
+        self.refresh()
+
+    # ---------- Searching ----------
+
+    def search_batch(self, query_embeddings, k: int = 5, nprobe: Optional[int] = None) -> List[List[Tuple[int, float]]]:
+        """Approximate top-k per query; falls back to exact search when untrained."""
+        self.refresh()
+        total = len(self.store)
+        if self.centroids is None or self.count > total:
+            return self.store.search_batch(query_embeddings, k)
+
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        queries = normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        probes = np.argsort(queries @ self.centroids.T, axis=1)[:, ::-1][:, :nprobe]
+        tail = np.arange(self.count, total)
+
+        results = []
+        for query, probe in zip(queries, probes):
+            rows = np.sort(np.concatenate([self.lists[i] for i in probe] + [tail]))
+            rows = rows[~self.store.is_deleted(rows)]
+            scores = self.store.embedding_rows(rows) @ query
+            top = top_k_indices(scores, k)
+            results.append([(int(rows[i]), float(scores[i])) for i in top])
+        return results
+
+    def search(self, query_embedding, k: int = 5, nprobe: Optional[int] = None) -> List[Tuple[int, float]]:
+        return self.search_batch([query_embedding], k, nprobe)[0]
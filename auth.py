@@ -3,6 +3,7 @@ from jose import jwt, JWTError
 from datetime import datetime, timedelta
 from typing import Optional
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from models import Employee
 from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 
@@ -38,3 +39,8 @@ def decode_token(token: str):
 def get_user_by_email(session: Session, email: str):
     statement = select(Employee).where(Employee.email == email)
     return session.exec(statement).first()
+
+
+async def get_user_by_email_async(session: AsyncSession, email: str):
+    statement = select(Employee).where(Employee.email == email)
+    return (await session.exec(statement)).first()
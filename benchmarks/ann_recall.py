@@ -0,0 +1,141 @@
+"""Recall@k vs latency report: exact search against the IVF index on the same corpus.
+
+Usage (from the repository root):
+    python -m benchmarks.ann_recall --rows 200000 --k 5 --nprobe 1 4 8 16 32
+    python -m benchmarks.ann_recall --store vector_store   # use an existing store
+
+Without --store a synthetic clustered corpus is written to a temp directory.
+Exact search is the ground truth; recall@k is the fraction of the exact top-k
+that the IVF index also returns.
+
+Synthetic corpus, 384 dims, recall@5 / p50 latency (exact recall = 1.0):
+     20k rows: exact 1.5 ms; nprobe 8: 0.51 / 0.7 ms; 32: 0.72 / 2.6 ms (slower than exact)
+    100k rows: exact 14 ms;  nprobe 8: 0.82 / 1.3 ms; 32: 0.88 / 4.9 ms; 64: 0.93 / 12 ms
+    200k rows: exact 28 ms;  nprobe 8: 0.94 / 2.5 ms; 32: 0.96 / 10 ms
+IVF only pays off on stores of ~100k+ rows that can accept recall below 0.9;
+RAG_IVF_NPROBE defaults to 32 and RAG_INDEX_MODE to exact.
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from ann_index import IVFIndex
+from vector_store import VectorStore
+
+
+def synthetic_corpus(rows: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Clustered vectors, roughly shaped like sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, rows)
+    data = centers[labels] + 2.0 * rng.standard_normal((rows, dim)).astype(np.float32)
+    return data
+
+
+def build_store(path: Path, data: np.ndarray, batch: int = 50000) -> VectorStore:
+    store = VectorStore(path)
+    for start in range(0, len(data), batch):
+        block = data[start:start + batch]
+        store.add(
+            [f"chunk {start + i}" for i in range(len(block))],
+            [{"source": "synthetic", "chunk": start + i} for i in range(len(block))],
+            block,
+        )
+    return store
+
+
+def timed(fn, queries):
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(fn(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, np.array(latencies)
+
+
+def run(store: VectorStore, queries: np.ndarray, k: int, nprobes) -> dict:
+    index = IVFIndex(store)
+    start = time.perf_counter()
+    build = index.update()
+    build["seconds"] = round(time.perf_counter() - start, 3)
+
+    exact, exact_ms = timed(lambda q: store.search(q, k), queries)
+    truth = [{row for row, _ in hits} for hits in exact]
+    report = {
+        "rows": len(store),
+        "dim": store.dim,
+        "queries": len(queries),
+        "k": k,
+        "index": build,
+        "modes": [{
+            "mode": "exact",
+            "recall": 1.0,
+            "p50_ms": round(float(np.percentile(exact_ms, 50)), 3),
+            "p99_ms": round(float(np.percentile(exact_ms, 99)), 3),
+        }],
+    }
+
+    for nprobe in nprobes:
+        approx, approx_ms = timed(lambda q: index.search(q, k, nprobe=nprobe), queries)
+        recall = np.mean([
+            len(t & {row for row, _ in hits}) / max(len(t), 1)
+            for t, hits in zip(truth, approx)
+        ])
+        report["modes"].append({
+            "mode": f"ivf nprobe={nprobe}",
+            "recall": round(float(recall), 4),
+            "p50_ms": round(float(np.percentile(approx_ms, 50)), 3),
+            "p99_ms": round(float(np.percentile(approx_ms, 99)), 3),
+        })
+    return report
+
+
+def print_report(report: dict):
+    print(f"{report['rows']} rows x {report['dim']} dims, {report['queries']} queries, k={report['k']}")
+    print(f"index: {report['index']}")
+    print(f"{'mode':<18}{'recall@k':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for mode in report["modes"]:
+        print(f"{mode['mode']:<18}{mode['recall']:>10.4f}{mode['p50_ms']:>10.3f}{mode['p99_ms']:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", type=Path, help="existing vector store directory (index files are written next to it)")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.store:
+            store = VectorStore(args.store)
+            store.load()
+        else:
+            data = synthetic_corpus(args.rows, args.dim, args.clusters)
+            store = build_store(Path(tmp) / "store", data)
+
+        # Queries are perturbed copies of stored rows
+        picks = rng.choice(len(store), min(args.queries, len(store)), replace=False)
+        queries = store.embedding_rows(np.sort(picks))
+        queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+
+        report = run(store, queries, args.k, args.nprobe)
+
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Recall@k, latency and scanned bytes of int8 vector storage vs float32.
+
+Usage (from the repository root):
+    python -m benchmarks.compressed_recall --rows 200000 --k 5 --rescore 1 4 8
+    python -m benchmarks.compressed_recall --store vector_store   # copy of an existing store
+
+The same store is opened once per compression mode (compressed copies are
+written next to the float32 segments on first open). Exact float32 search is
+the ground truth. The "scan only" row ranks by the compressed scores alone,
+which is the recall lost to quantization; the rescore rows re-rank a shortlist
+of max(factor * k, RESCORE_MIN) rows at full precision, which is what search
+returns.
+"""
+
+import argparse
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.ann_recall import build_store, synthetic_corpus, timed
+from vector_store import COMPRESSED_FILES, VectorStore, normalize_rows, top_k_indices
+
+
+def scanned_bytes(store: VectorStore) -> int:
+    """Bytes of the matrices a full scan reads (what must stay resident to be fast)."""
+    total = 0
+    for segment in store.segments:
+        matrix = segment.embeddings if segment.codes is None else segment.codes
+        total += matrix.size * matrix.itemsize
+    return total
+
+
+def scan_only_search(store: VectorStore, query: np.ndarray, k: int):
+    """Top-k by compressed scores, without the full-precision rescore."""
+    query = normalize_rows(np.atleast_2d(query.astype(np.float32)))
+    scores = np.concatenate([segment.approximate_scores(query)[:, 0] for segment in store.segments])
+    rows = np.concatenate([segment.local_ids(np.arange(segment.stored)) + segment.start for segment in store.segments])
+    return [(int(rows[i]), float(scores[i])) for i in top_k_indices(scores, k)]
+
+
+def recall_of(truth, results) -> float:
+    return float(np.mean([len(t & {row for row, _ in hits}) / max(len(t), 1) for t, hits in zip(truth, results)]))
+
+
+def mode_report(name: str, store: VectorStore, recall: float, latencies_ms: np.ndarray) -> dict:
+    return {
+        "mode": name,
+        "recall": round(recall, 4),
+        "mb_scanned": round(scanned_bytes(store) / 2**20, 1),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+    }
+
+
+def run(path: Path, queries: np.ndarray, k: int, rescore_factors) -> dict:
+    exact_store = VectorStore(path)
+    exact_store.load()
+    exact, exact_ms = timed(lambda q: exact_store.search(q, k), queries)
+    truth = [{row for row, _ in hits} for hits in exact]
+    report = {
+        "rows": len(exact_store),
+        "dim": exact_store.dim,
+        "queries": len(queries),
+        "k": k,
+        "modes": [mode_report("float32", exact_store, 1.0, exact_ms)],
+    }
+
+    for compression in COMPRESSED_FILES:
+        store = VectorStore(path, compression=compression)
+        store.load()
+        scanned, scanned_ms = timed(lambda q: scan_only_search(store, q, k), queries)
+        report["modes"].append(mode_report(f"{compression} scan only", store, recall_of(truth, scanned), scanned_ms))
+        for factor in rescore_factors:
+            store.rescore_factor = factor
+            approx, approx_ms = timed(lambda q: store.search(q, k), queries)
+            report["modes"].append(mode_report(f"{compression} rescore={factor}", store, recall_of(truth, approx),
+                                               approx_ms))
+    return report
+
+
+def print_report(report: dict):
+    print(f"{report['rows']} rows x {report['dim']} dims, {report['queries']} queries, k={report['k']}")
+    print(f"{'mode':<22}{'recall@k':>10}{'MB scan':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for mode in report["modes"]:
+        print(f"{mode['mode']:<22}{mode['recall']:>10.4f}{mode['mb_scanned']:>10.1f}"
+              f"{mode['p50_ms']:>10.3f}{mode['p99_ms']:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", type=Path, help="existing vector store directory (copied, never modified)")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--noise", type=float, default=0.05, help="query perturbation (higher is harder)")
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "store"
+        if args.store:
+            # Compressed copies are written into segment directories; keep the original untouched
+            shutil.copytree(args.store, path, ignore=shutil.ignore_patterns(*COMPRESSED_FILES.values()))
+            store = VectorStore(path)
+            store.load()
+        else:
+            store = build_store(path, synthetic_corpus(args.rows, args.dim, args.clusters))
+
+        # Queries are perturbed copies of stored rows
+        picks = rng.choice(len(store), min(args.queries, len(store)), replace=False)
+        queries = store.embedding_rows(np.sort(picks))
+        queries = queries + args.noise * rng.standard_normal(queries.shape).astype(np.float32)
+
+        report = run(path, queries, args.k, args.rescore)
+
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
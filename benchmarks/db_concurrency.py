@@ -0,0 +1,215 @@
+"""Check that SSE chat streams keep flowing while the FastAPI endpoints wait on the database.
+
+Usage (from the repository root):
+    python -m benchmarks.db_concurrency
+    python -m benchmarks.db_concurrency --streams 20 --lock-ms 1500
+    python -m benchmarks.db_concurrency --mode sync   # control: sync Session writes on the event loop
+
+The app runs in-process against a scratch corporate.db, with the agent
+replaced by a stream that yields one token every --interval-ms. While the
+streams run, another connection holds SQLite's write lock for --lock-ms (as an
+ingest worker or the MCP server would). Meanwhile new chat messages, which
+must write Conversation rows, and history/session reads go through the real
+endpoints. The report gives the largest gap between tokens of any stream and
+the event loop lag. The run exits 1 if a stream stalled longer than
+--max-stall-ms, so `--mode sync` (the same writes through the sync engine,
+inside the event loop) is expected to fail. The pass/fail check on the
+database layer alone is tests/test_db_concurrency.py; this script measures it.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+WRITE_MARKER = "[write]"
+
+
+def summarize(values_ms) -> dict:
+    values = np.array(values_ms) if len(values_ms) else np.zeros(1)
+    return {
+        "count": len(values_ms),
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "max_ms": round(float(values.max()), 2),
+    }
+
+
+def hold_write_lock(db_path: Path, start_after: float, hold: float, locked: threading.Event):
+    """Take the database write lock from a separate connection and keep it for `hold` seconds."""
+    time.sleep(start_after)
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    conn.execute("BEGIN IMMEDIATE")
+    locked.set()
+    time.sleep(hold)
+    conn.execute("COMMIT")
+    conn.close()
+
+
+async def run(args, workdir: Path) -> dict:
+    # main.py resolves static/, templates/, uploads/ and corporate.db against the working directory
+    os.chdir(workdir)
+    for name in ("static", "templates"):
+        if not (workdir / name).exists():
+            (workdir / name).symlink_to(REPO_ROOT / name)
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+
+    import httpx
+    from sqlmodel import Session
+
+    import db
+    db.init_db()
+    import main
+    from auth import create_access_token, get_password_hash
+    from models import ChatSession, Conversation, Employee
+
+    with Session(db.engine) as s:
+        user = Employee(email="bench@example.com", full_name="Bench", hashed_password=get_password_hash("bench"))
+        s.add(user)
+        s.commit()
+        s.refresh(user)
+        user_id = user.id
+
+    token_gaps = []
+
+    async def fake_agent(messages):
+        if WRITE_MARKER in messages[-1]["content"]:
+            # Writers only need their messages saved
+            yield {"type": "content", "content": "ok"}
+            return
+        last = time.perf_counter()
+        for _ in range(args.tokens):
+            await asyncio.sleep(args.interval_ms / 1000)
+            now = time.perf_counter()
+            token_gaps.append((now - last) * 1000 - args.interval_ms)
+            last = now
+            yield {"type": "content", "content": "token "}
+
+    main.stream_agent_response = fake_agent
+
+    loop_lag = []
+    stop = asyncio.Event()
+
+    async def watch_loop():
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            loop_lag.append((time.perf_counter() - start) * 1000 - 5)
+
+    transport = httpx.ASGITransport(app=main.app)
+    cookies = {"access_token": create_access_token("bench@example.com")}
+    db_latencies = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", cookies=cookies) as client:
+        async def chat(text):
+            response = await client.post("/api/chat/stream", json={"user_input": text, "session_id": None})
+            response.raise_for_status()
+
+        async def timed_db_call(call):
+            start = time.perf_counter()
+            await call()
+            db_latencies.append((time.perf_counter() - start) * 1000)
+
+        async def write_message(i):
+            if args.mode == "async":
+                await client.post("/api/conversations/sessions/new")
+                await chat(f"{WRITE_MARKER} message {i}")
+            else:
+                # What the endpoints did before: a sync Session inside the event loop
+                with Session(db.engine) as s:
+                    session = ChatSession(user_id=user_id, preview=f"message {i}")
+                    s.add(session)
+                    s.commit()
+                    s.add(Conversation(session_id=session.id, user_id=user_id, role="user", content=f"message {i}"))
+                    s.commit()
+
+        async def read_history():
+            await client.get("/api/conversations/sessions")
+            await client.get("/api/conversations")
+
+        watcher = asyncio.create_task(watch_loop())
+        locked = threading.Event()
+        locker = threading.Thread(
+            target=hold_write_lock,
+            args=(workdir / "corporate.db", args.lock_after_ms / 1000, args.lock_ms / 1000, locked),
+        )
+        locker.start()
+
+        streams = [asyncio.create_task(chat(f"stream {i}")) for i in range(args.streams)]
+        await asyncio.get_running_loop().run_in_executor(None, locked.wait)
+        db_work = [asyncio.create_task(timed_db_call(lambda i=i: write_message(i))) for i in range(args.writers)]
+        db_work += [asyncio.create_task(timed_db_call(read_history)) for _ in range(args.readers)]
+
+        await asyncio.gather(*streams, *db_work)
+        stop.set()
+        await watcher
+        locker.join()
+
+    stall = max(token_gaps) if token_gaps else 0.0
+    return {
+        "mode": args.mode,
+        "params": {
+            "streams": args.streams,
+            "tokens": args.tokens,
+            "interval_ms": args.interval_ms,
+            "lock_ms": args.lock_ms,
+            "writers": args.writers,
+            "readers": args.readers,
+        },
+        "token_delay": summarize(token_gaps),
+        "loop_lag": summarize(loop_lag),
+        "db_requests": summarize(db_latencies),
+        "max_stall_ms": round(stall, 2),
+        "blocked": stall > args.max_stall_ms,
+    }
+
+
+def print_report(report: dict):
+    params = report["params"]
+    print(f"mode {report['mode']}: {params['streams']} streams x {params['tokens']} tokens every "
+          f"{params['interval_ms']} ms, write lock held {params['lock_ms']} ms, "
+          f"{params['writers']} writers, {params['readers']} readers")
+    print(f"{'':<16}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name in ("token_delay", "loop_lag", "db_requests"):
+        stats = report[name]
+        print(f"{name:<16}{stats['count']:>8}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['max_ms']:>10.2f}")
+    print("streams BLOCKED by database work" if report["blocked"] else "streams not blocked by database work")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["async", "sync"], default="async")
+    parser.add_argument("--streams", type=int, default=10)
+    parser.add_argument("--tokens", type=int, default=150)
+    parser.add_argument("--interval-ms", type=float, default=10)
+    parser.add_argument("--lock-ms", type=float, default=1000, help="how long another connection holds the write lock")
+    parser.add_argument("--lock-after-ms", type=float, default=200)
+    parser.add_argument("--writers", type=int, default=5, help="chat messages written while the lock is held")
+    parser.add_argument("--readers", type=int, default=5, help="history/session list reads during the run")
+    parser.add_argument("--max-stall-ms", type=float, default=100, help="largest acceptable extra delay of a token")
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    args = parser.parse_args()
+
+    output = args.output.resolve() if args.output else None
+    with tempfile.TemporaryDirectory() as tmp:
+        report = asyncio.run(run(args, Path(tmp)))
+        os.chdir(REPO_ROOT)
+
+    print_report(report)
+    if output:
+        output.write_text(json.dumps(report, indent=2))
+    sys.exit(1 if report["blocked"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Parity and throughput of the PyTorch and int8 ONNX embedding backends.
+
+Usage (from the repository root, after `python onnx_embeddings.py`):
+    python -m benchmarks.embedding_backends --texts 512 --batch 1 32 128
+    python -m benchmarks.embedding_backends --corpus uploads/handbook.txt --min-cosine 0.99
+
+The corpus is split into ~1000 character chunks (README.md by default,
+repeated to --texts chunks). Parity compares each chunk's two embeddings and
+the query-to-chunk cosine scores the retriever ranks on; the run exits with
+status 1 when the lowest per-chunk cosine falls under --min-cosine.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from config import EMBEDDING_ONNX_DIR, EMBEDDING_ONNX_FILE, EMBEDDING_THREADS
+from onnx_embeddings import OnnxEmbeddings
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+QUERIES = [
+    "How do I start the application?",
+    "Which access levels exist?",
+    "upload a PDF document",
+    "environment variables for email",
+    "delete a conversation session",
+    "MCP tools for tasks and projects",
+]
+
+
+def load_corpus(path: Path, count: int, size: int = 1000) -> list:
+    text = path.read_text(encoding="utf-8", errors="ignore")
+    chunks = [text[i:i + size] for i in range(0, len(text), size) if text[i:i + size].strip()]
+    return [chunks[i % len(chunks)] for i in range(count)]
+
+
+def normalized(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+
+def throughput(model, texts: list, batch: int) -> float:
+    """Texts per second when embedding in calls of `batch` texts."""
+    model.embed_documents(texts[:batch])  # warm up
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch):
+        model.embed_documents(texts[i:i + batch])
+    return len(texts) / (time.perf_counter() - start)
+
+
+def parity(reference, candidate, texts: list, k: int) -> dict:
+    ref_docs, cand_docs = normalized(reference.embed_documents(texts)), normalized(candidate.embed_documents(texts))
+    ref_queries = normalized(reference.embed_documents(QUERIES))
+    cand_queries = normalized(candidate.embed_documents(QUERIES))
+
+    cosines = np.sum(ref_docs * cand_docs, axis=1)
+    ref_scores, cand_scores = ref_queries @ ref_docs.T, cand_queries @ cand_docs.T
+    overlap = [
+        len(set(np.argsort(-r)[:k]) & set(np.argsort(-c)[:k])) / k
+        for r, c in zip(ref_scores, cand_scores)
+    ]
+    return {
+        "min_cosine": round(float(cosines.min()), 5),
+        "mean_cosine": round(float(cosines.mean()), 5),
+        "max_score_diff": round(float(np.abs(ref_scores - cand_scores).max()), 5),
+        f"top{k}_overlap": round(float(np.mean(overlap)), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, default=Path("README.md"))
+    parser.add_argument("--texts", type=int, default=256)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 32, 128])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--onnx-dir", default=EMBEDDING_ONNX_DIR)
+    parser.add_argument("--onnx-file", nargs="+", default=[EMBEDDING_ONNX_FILE],
+                        help="ONNX files to compare, e.g. model.onnx model_int8.onnx")
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    args = parser.parse_args()
+
+    texts = load_corpus(args.corpus, args.texts)
+    start = time.perf_counter()
+    from langchain_huggingface import HuggingFaceEmbeddings
+    reference = HuggingFaceEmbeddings(model_name=MODEL_NAME, model_kwargs={"device": "cpu"})
+    backends = {"torch": (reference, time.perf_counter() - start)}
+    for name in args.onnx_file:
+        start = time.perf_counter()
+        model = OnnxEmbeddings(args.onnx_dir, name, threads=EMBEDDING_THREADS)
+        backends[f"onnx:{name}"] = (model, time.perf_counter() - start)
+
+    report = {"texts": len(texts), "corpus": str(args.corpus), "backends": []}
+    for name, (model, load_seconds) in backends.items():
+        entry = {"backend": name, "load_s": round(load_seconds, 2)}
+        entry.update({f"batch{b}_texts_per_s": round(throughput(model, texts, b), 1) for b in args.batch})
+        if model is not reference:
+            entry.update(parity(reference, model, texts, args.k))
+        report["backends"].append(entry)
+        print(json.dumps(entry))
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    failed = [entry["backend"] for entry in report["backends"] if entry.get("min_cosine", 1.0) < args.min_cosine]
+    if failed:
+        print(f"Parity below {args.min_cosine}: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
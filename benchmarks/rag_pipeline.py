@@ -0,0 +1,290 @@
+"""End-to-end RAG benchmark: ingest_document, similarity_search, hybrid_search and query_documents.
+
+Usage (from the repository root):
+    python -m benchmarks.rag_pipeline --chunks 10000 --output bench.json
+    python -m benchmarks.rag_pipeline --chunks 1000000 --chunks-per-doc 500 --queries 500
+    python -m benchmarks.rag_pipeline --embedder minilm --chunks 2000 --compare bench.json
+
+A synthetic corpus (Zipf-distributed words) is written as text documents and
+ingested through the real pipeline into a scratch directory (its own
+corporate.db, uploads/ and vector_store/). The default `hash` embedder is a
+deterministic feature-hashing bag of words, so runs need no model download or
+network; `minilm` uses the configured embedding model. Query caches are off
+unless --cache is given. Results are written as JSON (with the git commit) and
+--compare prints the change of every metric against an earlier result file.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+CHARS_PER_CHUNK = 680   # New text per chunk after overlap and splitting on separators
+
+
+class HashEmbeddings:
+    """Deterministic bag-of-words embedder (signed feature hashing), no model needed."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    @lru_cache(maxsize=None)
+    def _slot(self, token: str):
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, 1.0 if value >> 63 else -1.0
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in re.findall(r"\w+", text.lower()):
+            slot, sign = self._slot(token)
+            vector[slot] += sign
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class SyntheticCorpus:
+    """Documents and queries drawn from one Zipf-distributed synthetic vocabulary."""
+
+    SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "qua", "bri", "dom", "fel", "gor", "pax"]
+
+    def __init__(self, vocabulary: int = 20000, seed: int = 0):
+        self.rng = np.random.default_rng(seed)
+        words = set()
+        while len(words) < vocabulary:
+            length = self.rng.integers(2, 5)
+            words.add("".join(self.rng.choice(self.SYLLABLES, length)))
+        self.words = np.array(sorted(words))
+        weights = 1.0 / np.arange(1, vocabulary + 1)
+        self.weights = weights / weights.sum()
+
+    def _words(self, count: int) -> np.ndarray:
+        return self.words[self.rng.choice(len(self.words), count, p=self.weights)]
+
+    def document(self, chars: int) -> str:
+        sentences = []
+        size = 0
+        while size < chars:
+            sentence = " ".join(self._words(int(self.rng.integers(6, 18)))).capitalize() + "."
+            sentences.append(sentence)
+            size += len(sentence) + 1
+            if self.rng.random() < 0.15:
+                sentences.append("\n\n")
+        return " ".join(sentences)
+
+    def query(self) -> str:
+        return " ".join(self._words(int(self.rng.integers(2, 7))))
+
+
+def percentiles(latencies: List[float]) -> dict:
+    values = np.array(latencies)
+    return {
+        "count": len(values),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+    }
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args, workdir: Path) -> dict:
+    # rag_manager resolves uploads/, vector_store/ and corporate.db against the working directory
+    os.chdir(workdir)
+    if not args.cache:
+        os.environ.setdefault("RAG_QUERY_CACHE_SIZE", "0")
+        os.environ.setdefault("RAG_RESULT_CACHE_SIZE", "0")
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+
+    start = time.perf_counter()
+    import db
+    db.init_db()
+    import rag_manager
+    import_seconds = time.perf_counter() - start
+    if args.embedder == "hash":
+        rag_manager.embeddings = HashEmbeddings()
+
+    corpus = SyntheticCorpus(args.vocabulary, args.seed)
+    corpus_dir = workdir / "corpus"
+    corpus_dir.mkdir(exist_ok=True)
+    documents = max(1, -(-args.chunks // args.chunks_per_doc))
+    chunks = 0
+    text_bytes = 0
+    failures = 0
+    ingest_start = time.perf_counter()
+    for i in range(documents):
+        path = corpus_dir / f"doc_{i:06d}.txt"
+        path.write_text(corpus.document(args.chunks_per_doc * CHARS_PER_CHUNK), encoding="utf-8")
+        text_bytes += path.stat().st_size
+        result = rag_manager.ingest_document(str(path), {"uploaded_by": f"user{i % 5}@example.com"})
+        if "error" in result:
+            failures += 1
+            print(f"[bench] {path.name}: {result['error']}")
+        chunks += result.get("chunks_created", 0)
+        path.unlink()
+        if args.verbose and (i + 1) % 10 == 0:
+            print(f"[bench] ingested {i + 1}/{documents} documents, {chunks} chunks")
+    ingest_seconds = time.perf_counter() - ingest_start
+
+    # Cold load of the store and its derived indexes, as a fresh process would
+    from vector_store import VectorStore
+    from bm25_index import BM25Index
+    from metadata_index import MetadataIndex
+    start = time.perf_counter()
+    store = VectorStore(rag_manager.VECTOR_STORE_DIR)
+    store.load()
+    store_seconds = time.perf_counter() - start
+    BM25Index(store).refresh()
+    MetadataIndex(store).refresh()
+    indexes_seconds = time.perf_counter() - start - store_seconds
+
+    queries = [corpus.query() for _ in range(args.queries)]
+    searches = {
+        "similarity_search": lambda q: rag_manager.similarity_search(q, args.k),
+        "hybrid_search": lambda q: rag_manager.hybrid_search(q, args.k),
+        "filtered_search": lambda q: rag_manager.similarity_search(q, args.k, filters={"uploaded_by": "user1@example.com"}),
+        "query_documents": lambda q: rag_manager.query_documents(q, args.k),
+    }
+    search_report = {}
+    for name, search in searches.items():
+        search(queries[0])  # warm up
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            search(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+        search_report[name] = percentiles(latencies)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "params": {
+            "embedder": args.embedder,
+            "chunks_requested": args.chunks,
+            "chunks_per_doc": args.chunks_per_doc,
+            "vocabulary": args.vocabulary,
+            "queries": args.queries,
+            "k": args.k,
+            "cache": args.cache,
+            "seed": args.seed,
+        },
+        "ingest": {
+            "documents": documents,
+            "failed": failures,
+            "chunks": chunks,
+            "seconds": round(ingest_seconds, 3),
+            "chunks_per_s": round(chunks / ingest_seconds, 1) if ingest_seconds else None,
+            "mb_per_s": round(text_bytes / 2**20 / ingest_seconds, 3) if ingest_seconds else None,
+        },
+        "load": {
+            "import_s": round(import_seconds, 3),
+            "store_s": round(store_seconds, 4),
+            "indexes_s": round(indexes_seconds, 4),
+        },
+        "search": search_report,
+        "stats": rag_manager.get_vector_store_stats(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def flatten(report: dict, prefix: str = "") -> dict:
+    """Numeric leaves as {"ingest.chunks_per_s": ...} for comparisons."""
+    values = {}
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = value
+    return values
+
+
+def print_report(report: dict, baseline: dict = None):
+    ingest, load = report["ingest"], report["load"]
+    print(f"commit {report['commit']}, embedder {report['params']['embedder']}")
+    print(f"ingest: {ingest['documents']} docs, {ingest['chunks']} chunks in {ingest['seconds']}s "
+          f"({ingest['chunks_per_s']} chunks/s, {ingest['mb_per_s']} MB/s)")
+    print(f"load: import {load['import_s']}s, store {load['store_s']}s, indexes {load['indexes_s']}s")
+    print(f"{'search':<20}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for name, stats in report["search"].items():
+        print(f"{name:<20}{stats['p50_ms']:>10.3f}{stats['p99_ms']:>10.3f}{stats['mean_ms']:>10.3f}")
+    print(f"peak RSS: {report['peak_rss_mb']} MB")
+
+    if baseline:
+        print(f"\nchange vs {baseline.get('commit')} ({baseline.get('timestamp')}):")
+        old = flatten({key: baseline.get(key) for key in ("ingest", "load", "search", "peak_rss_mb")
+                       if baseline.get(key) is not None})
+        new = flatten({key: report[key] for key in ("ingest", "load", "search", "peak_rss_mb")})
+        for name, value in new.items():
+            if old.get(name):
+                print(f"  {name:<36}{old[name]:>12}{value:>12}{(value - old[name]) / old[name]:>+9.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=10000, help="approximate corpus size in chunks")
+    parser.add_argument("--chunks-per-doc", type=int, default=100)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--embedder", choices=["hash", "minilm"], default="hash")
+    parser.add_argument("--cache", action="store_true", help="keep the query and result caches enabled")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", type=Path, help="keep the scratch store here instead of a temp directory")
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    parser.add_argument("--compare", type=Path, help="earlier JSON report to compare against")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    output = args.output.resolve() if args.output else None
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    if args.workdir:
+        args.workdir.mkdir(parents=True, exist_ok=True)
+        report = run(args, args.workdir.resolve())
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            report = run(args, Path(tmp))
+            os.chdir(REPO_ROOT)
+
+    print_report(report, baseline)
+    if output:
+        output.write_text(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Exact search latency vs search threads on one store (sharded brute-force scan).
+
+Usage (from the repository root):
+    python -m benchmarks.sharded_search --rows 1000000 --threads 1 2 4 8
+    python -m benchmarks.sharded_search --store vector_store --batch 8
+
+Shards are views of the memory-mapped segments, so every thread count scans
+the same pages; results are checked against the single-threaded run. Pin
+OPENBLAS_NUM_THREADS=1 (or MKL_NUM_THREADS=1) to measure the shard threads
+alone rather than BLAS threading on top of them.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.ann_recall import build_store, synthetic_corpus, timed
+from vector_store import VectorStore
+
+
+def run(path: Path, queries: np.ndarray, k: int, batch: int, threads) -> dict:
+    batches = [queries[i:i + batch] for i in range(0, len(queries), batch)]
+    report = {"queries": len(queries), "batch": batch, "k": k, "cpus": os.cpu_count(), "modes": []}
+    baseline = None
+    for count in threads:
+        store = VectorStore(path, search_threads=count)
+        store.load()
+        report["rows"], report["dim"] = len(store), store.dim
+        store.search_batch(batches[0], k)  # warm the page cache and the pool
+        results, latencies = timed(lambda q: store.search_batch(q, k), batches)
+        rows = [[row for row, _ in hits] for result in results for hits in result]
+        if baseline is None:
+            baseline = (rows, float(np.percentile(latencies, 50)))
+        p50 = float(np.percentile(latencies, 50))
+        report["modes"].append({
+            "threads": count,
+            "shards": len(store._shards(store.segments)),
+            "p50_ms": round(p50, 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+            "speedup": round(baseline[1] / p50, 2),
+            "same_results": rows == baseline[0],
+        })
+    return report
+
+
+def print_report(report: dict):
+    print(f"{report['rows']} rows x {report['dim']} dims, {report['queries']} queries "
+          f"in batches of {report['batch']}, k={report['k']}, {report['cpus']} CPUs")
+    print(f"{'threads':>8}{'shards':>8}{'p50 ms':>10}{'p99 ms':>10}{'speedup':>9}{'same':>6}")
+    for mode in report["modes"]:
+        print(f"{mode['threads']:>8}{mode['shards']:>8}{mode['p50_ms']:>10.3f}{mode['p99_ms']:>10.3f}"
+              f"{mode['speedup']:>9.2f}{str(mode['same_results']):>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", type=Path, help="existing vector store directory (read only)")
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=1, help="queries per search_batch call")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--threads", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.store:
+            path = args.store
+        else:
+            path = Path(tmp) / "store"
+            build_store(path, synthetic_corpus(args.rows, args.dim, args.clusters))
+        queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+        report = run(path, queries, args.k, args.batch, args.threads)
+
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
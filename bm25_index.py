@@ -0,0 +1,301 @@
+"""BM25 Index - On-disk inverted index for keyword search over a VectorStore.
+
+Dense embeddings blur exact identifiers (codes, naming rules, acronyms); this
+index scores them lexically so they can be fused with vector results. Files
+live next to the store they index:
+    bm25.json            rows indexed, total token count (running BM25 totals), postings segments
+    bm25/doclens.u32     token count of each indexed row (append-only)
+    bm25/<name>/         one immutable postings segment per update:
+        terms.u64        sorted term hashes
+        starts.u64       offset of each term's postings (len(terms) + 1)
+        rows.u32         row ids, grouped by term
+        tfs.u16          term frequency of each posting
+
+update() indexes rows appended to the store since the last call and merges
+small postings segments, mirroring VectorStore compaction. Deleted rows are
+filtered at query time and dropped from postings when segments merge.
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+from collections import Counter
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from vector_store import (
+    _append_array,
+    _file_lock,
+    _remove_paths,
+    _stat_fingerprint,
+    _write_file,
+    _write_json_atomic,
+    top_k_indices,
+)
+
+BM25_MANIFEST_FILE = "bm25.json"
+BM25_DIR = "bm25"
+BM25_LOCK_FILE = ".bm25.lock"
+DOCLENS_FILE = "doclens.u32"
+TERMS_FILE = "terms.u64"
+STARTS_FILE = "starts.u64"
+ROWS_FILE = "rows.u32"
+TFS_FILE = "tfs.u16"
+
+K1 = 1.2
+B = 0.75
+UPDATE_BATCH_ROWS = 65536   # Rows tokenized per postings segment
+MERGE_TARGET_ROWS = 65536   # Segments at or above this size are left alone
+MERGE_TRIGGER_SEGMENTS = 8
+
+# Words, plus compounds such as "XY-12", "v2.1" or "file_name.pdf"
+TOKEN_RE = re.compile(r"\w+(?:[-./]\w+)*")
+COMPOUND_SPLIT_RE = re.compile(r"[-./_]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase tokens; compounds are kept whole and also split into their parts."""
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        parts = [part for part in COMPOUND_SPLIT_RE.split(token) if part]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+@lru_cache(maxsize=65536)
+def _term_hash(term: str) -> int:
+    """Stable 64-bit term id (Python's hash() is salted per process)."""
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _build_postings(terms: np.ndarray, rows: np.ndarray, tfs: np.ndarray):
+    """Sort flat (term, row, tf) triples into the segment file layout."""
+    order = np.lexsort((rows, terms))
+    terms, rows, tfs = terms[order], rows[order], tfs[order]
+    unique_terms, starts = np.unique(terms, return_index=True)
+    starts = np.append(starts, len(terms)).astype(np.uint64)
+    return unique_terms, starts, rows, tfs
+
+
+class PostingsSegment:
+    """One immutable, memory-mapped postings segment."""
+
+    def __init__(self, path, rows: int):
+        self.path = path
+        self.row_count = rows
+        # Names restart after the index is cleared, so reuse is keyed on file identity too
+        self.fingerprint = _stat_fingerprint(path / TERMS_FILE)
+        self.terms = np.fromfile(path / TERMS_FILE, dtype=np.uint64)
+        self.starts = np.fromfile(path / STARTS_FILE, dtype=np.uint64)
+        self.rows = np.memmap(path / ROWS_FILE, dtype=np.uint32, mode="r")
+        self.tfs = np.memmap(path / TFS_FILE, dtype=np.uint16, mode="r")
+
+    def postings(self, term: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, term frequencies) for one term hash."""
+        i = int(np.searchsorted(self.terms, np.uint64(term)))
+        if i == len(self.terms) or self.terms[i] != term:
+            return self.rows[:0], self.tfs[:0]
+        lo, hi = int(self.starts[i]), int(self.starts[i + 1])
+        return self.rows[lo:hi], self.tfs[lo:hi]
+
+    def triples(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Expand back to flat (term, row, tf) arrays for merging."""
+        terms = np.repeat(self.terms, np.diff(self.starts).astype(np.int64))
+        return terms, np.asarray(self.rows), np.asarray(self.tfs)
+
+
+class BM25Index:
+    """Okapi BM25 keyword index layered on a VectorStore."""
+
+    def __init__(self, store):
+        self.store = store
+        # (segments, doclens, count, total_length), swapped as one so searches never see a half-loaded index
+        self._view = ([], np.empty(0, dtype=np.uint32), 0, 0)
+        self._fingerprint = None
+
+    @property
+    def path(self):
+        return self.store.path
+
+    @property
+    def count(self) -> int:
+        return self._view[2]
+
+    def _read_manifest(self) -> dict:
+        manifest_path = self.path / BM25_MANIFEST_FILE
+        if not manifest_path.exists():
+            return {"count": 0, "total_length": 0, "next_segment": 1, "segments": []}
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def refresh(self):
+        """Pick up index changes on disk without rescanning it.
+
+        N and avgdl come from the manifest's running totals, document lengths are
+        memory-mapped and segments that were already loaded are reused.
+        """
+        fingerprint = _stat_fingerprint(self.path / BM25_MANIFEST_FILE)
+        if fingerprint == self._fingerprint:
+            return
+        self._fingerprint = fingerprint
+
+        manifest = self._read_manifest()
+        count = manifest["count"]
+        if not count:
+            self._view = ([], np.empty(0, dtype=np.uint32), 0, 0)
+            return
+        loaded = {(segment.path, segment.fingerprint): segment for segment in self._view[0]}
+        segments = []
+        for entry in manifest["segments"]:
+            path = self.path / entry["path"]
+            segment = loaded.get((path, _stat_fingerprint(path / TERMS_FILE)))
+            segments.append(segment or PostingsSegment(path, entry["rows"]))
+        doclens = np.memmap(self.path / BM25_DIR / DOCLENS_FILE, dtype=np.uint32, mode="r", shape=(count,))
+        self._view = (segments, doclens, count, manifest["total_length"])
+
+    # ---------- Building ----------
+
+    def update(self) -> dict:
+        """Index rows appended to the store since the last update."""
+        self.store.refresh()
+        self.path.mkdir(parents=True, exist_ok=True)
+        with _file_lock(self.path / BM25_LOCK_FILE):
+            manifest = self._read_manifest()
+            total = len(self.store)
+            if manifest["count"] > total:
+                # The store was cleared or replaced underneath us
+                self._remove_files()
+                manifest = self._read_manifest()
+
+            start = manifest["count"]
+            while manifest["count"] < total:
+                stop = min(manifest["count"] + UPDATE_BATCH_ROWS, total)
+                manifest = self._append(manifest, manifest["count"], stop)
+            merged = self._merge_small_segments(manifest)
+        self.refresh()
+        return {"status": "current" if start == total else "indexed", "rows": total,
+                "added": total - start, "segments_merged": merged}
+
+    def _write_segment(self, manifest: dict, triples, rows: int) -> dict:
+        name = f"{manifest['next_segment']:06d}"
+        segments_dir = self.path / BM25_DIR
+        tmp_dir = segments_dir / f".tmp-{name}"
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        tmp_dir.mkdir(parents=True)
+
+        terms, starts, row_ids, tfs = _build_postings(*triples)
+        _write_file(tmp_dir / TERMS_FILE, terms.astype(np.uint64).tobytes())
+        _write_file(tmp_dir / STARTS_FILE, starts.tobytes())
+        _write_file(tmp_dir / ROWS_FILE, row_ids.astype(np.uint32).tobytes())
+        _write_file(tmp_dir / TFS_FILE, tfs.astype(np.uint16).tobytes())
+        os.replace(tmp_dir, segments_dir / name)
+        manifest["next_segment"] += 1
+        return {"path": f"{BM25_DIR}/{name}", "rows": rows}
+
+    def _append(self, manifest: dict, start: int, stop: int) -> dict:
+        terms, rows, tfs = [], [], []
+        doclens = np.zeros(stop - start, dtype=np.uint32)
+        stored = self.store.stored_rows(start, stop)
+        stored = stored[~self.store.is_deleted(stored)].tolist()
+        for row, (text, _) in zip(stored, self.store.get_chunks(stored)):
+            counts = Counter(tokenize(text))
+            doclens[row - start] = sum(counts.values())
+            for term, tf in counts.items():
+                terms.append(_term_hash(term))
+                rows.append(row)
+                tfs.append(min(tf, 65535))
+
+        manifest = dict(manifest)
+        segments = list(manifest["segments"])
+        if terms:
+            triples = (np.array(terms, dtype=np.uint64), np.array(rows, dtype=np.uint32), np.array(tfs, dtype=np.uint16))
+            segments.append(self._write_segment(manifest, triples, stop - start))
+
+        (self.path / BM25_DIR).mkdir(parents=True, exist_ok=True)
+        _append_array(self.path / BM25_DIR / DOCLENS_FILE, doclens, start)
+
+        manifest.update(count=stop, total_length=manifest["total_length"] + int(doclens.sum()), segments=segments)
+        _write_json_atomic(self.path / BM25_MANIFEST_FILE, manifest)
+        return manifest
+
+    def _merge_small_segments(self, manifest: dict) -> int:
+        """Fold small postings segments into one so queries touch few files."""
+        small = [entry for entry in manifest["segments"] if entry["rows"] < MERGE_TARGET_ROWS]
+        if len(small) < MERGE_TRIGGER_SEGMENTS:
+            return 0
+        parts = [PostingsSegment(self.path / entry["path"], entry["rows"]).triples() for entry in small]
+        terms, rows, tfs = (np.concatenate([part[i] for part in parts]) for i in range(3))
+        live = ~self.store.is_deleted(rows)
+        segments = [entry for entry in manifest["segments"] if entry not in small]
+        if live.any():
+            segments.append(self._write_segment(manifest, (terms[live], rows[live], tfs[live]),
+                                                sum(entry["rows"] for entry in small)))
+        _write_json_atomic(self.path / BM25_MANIFEST_FILE, {**manifest, "segments": segments})
+        self._remove_unreferenced(segments)
+        return len(small)
+
+    def _remove_unreferenced(self, segments: List[dict]):
+        referenced = {entry["path"] for entry in segments}
+        segments_dir = self.path / BM25_DIR
+        if segments_dir.exists():
+            for child in segments_dir.iterdir():
+                if child.is_dir() and f"{BM25_DIR}/{child.name}" not in referenced:
+                    shutil.rmtree(child, ignore_errors=True)
+
+    def _remove_files(self):
+        _remove_paths(self.path / BM25_MANIFEST_FILE, self.path / BM25_DIR)
+
+    def clear(self):
+        """Drop the index (e.g. after the store was cleared)."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        with _file_lock(self.path / BM25_LOCK_FILE):
+            self._remove_files()
+        self.refresh()
+
+    # ---------- Searching ----------
+
+    def search(self, query: str, k: int = 5, allowed_rows: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Return (row, BM25 score) pairs for the k best keyword matches.
+
+        allowed_rows, if given, holds the only row ids that may match (pre-filter).
+        """
+        self.refresh()
+        segments, doclens, count, total_length = self._view
+        terms = {_term_hash(term) for term in tokenize(query)}
+        if not count or not terms:
+            return []
+
+        avgdl = total_length / count
+        hit_rows, hit_scores = [], []
+        for term in terms:
+            postings = [segment.postings(term) for segment in segments]
+            df = sum(len(rows) for rows, _ in postings)
+            if not df:
+                continue
+            idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+            for rows, tfs in postings:
+                if not len(rows):
+                    continue
+                tf = tfs.astype(np.float32)
+                norm = K1 * (1 - B + B * doclens[rows] / avgdl)
+                hit_rows.append(rows)
+                hit_scores.append(idf * tf * (K1 + 1) / (tf + norm))
+        if not hit_rows:
+            return []
+
+        rows, inverse = np.unique(np.concatenate(hit_rows), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(hit_scores))
+        keep = ~self.store.is_deleted(rows)
+        if allowed_rows is not None:
+            keep &= np.isin(rows, allowed_rows)
+        rows, scores = rows[keep], scores[keep]
+        top = top_k_indices(scores, k)
+        return [(int(rows[i]), float(scores[i])) for i in top]
@@ -8,6 +8,43 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 8
 
 SQLITE_DB_URL = "sqlite:///./corporate.db"
+ASYNC_SQLITE_DB_URL = SQLITE_DB_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)  # FastAPI request path
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
 MCP_SERVER_PORT = int(os.getenv("MCP_SERVER_PORT", 3003))
 MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", f"http://localhost:{MCP_SERVER_PORT}/mcp/")
+# Persistent MCP sessions: concurrent tool calls per server, and idle seconds before a health-check ping
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", 4))
+MCP_PING_AFTER = int(os.getenv("MCP_PING_AFTER", 30))
+# Seconds before the chat agent re-lists MCP tools (it is only rebuilt if they changed; 0 = every message)
+AGENT_CACHE_TTL = int(os.getenv("AGENT_CACHE_TTL", 300))
+# Chat sessions whose recent history is kept in memory (least recently used are evicted)
+CONVERSATION_CACHE_SIZE = int(os.getenv("CONVERSATION_CACHE_SIZE", 256))
+# Token budget of past messages sent with each chat message; older turns are folded into a summary
+CHAT_HISTORY_TOKENS = int(os.getenv("CHAT_HISTORY_TOKENS", 3000))
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", 400))
+
+# RAG retrieval: "exact" brute-force cosine, or "ivf" approximate index
+RAG_INDEX_MODE = os.getenv("RAG_INDEX_MODE", "exact")
+# IVF lists scanned per query; 32 keeps recall@5 near 0.9 on 100k rows (see benchmarks/ann_recall.py)
+RAG_IVF_NPROBE = int(os.getenv("RAG_IVF_NPROBE", 32))
+# Scan an int8 copy of the vectors ("none" or "int8": 4x less memory, ~1.3x float32 search latency)
+RAG_VECTOR_COMPRESSION = os.getenv("RAG_VECTOR_COMPRESSION", "none")
+RAG_SEARCH_THREADS = int(os.getenv("RAG_SEARCH_THREADS", 0))  # Parallel search shards; 0 = one per CPU
+# Fuse BM25 keyword hits with vector hits in query_documents
+RAG_HYBRID_SEARCH = os.getenv("RAG_HYBRID_SEARCH", "true").lower() == "true"
+# Token budget of the document context returned by query_documents
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", 1500))
+# Embedding runtime: "torch" (sentence-transformers) or "onnx" (int8 export, see onnx_embeddings.py)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "models/all-MiniLM-L6-v2-onnx")
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "model_int8.onnx")
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", 0))  # 0 = onnxruntime default (all cores)
+# In-process LRU caches for repeated searches (0 disables)
+RAG_QUERY_CACHE_SIZE = int(os.getenv("RAG_QUERY_CACHE_SIZE", 1024))    # Query embeddings
+RAG_RESULT_CACHE_SIZE = int(os.getenv("RAG_RESULT_CACHE_SIZE", 256))   # Search results per index version
+
+# Background document ingestion
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", 200)) * 1024 * 1024
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", 32))
+INGEST_EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH", 256))  # Chunks embedded and appended per step
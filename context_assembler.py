@@ -0,0 +1,141 @@
+"""Context Assembler - Merge retrieved chunks into a token-budgeted prompt context.
+
+Chunks are split with CHUNK_OVERLAP characters of overlap, so hits from the
+same document often repeat text. Hits are grouped by document and sorted by
+position. Overlapping or adjacent chunks are then stitched into one passage,
+with the repeated span kept once. Passages are taken in relevance order until
+the token budget is spent, and printed per document in reading order.
+"""
+
+import math
+from typing import List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+CHARS_PER_TOKEN = 4     # Rough average for English text with Mistral/Llama style tokenizers
+MERGE_GAP = 4           # Chunks this close (stripped separator whitespace) count as adjacent
+MAX_TEXT_OVERLAP = 400  # Longest overlap searched for in chunks without offsets
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (no tokenizer is loaded in this process)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _document_key(metadata: dict):
+    return metadata.get("file_id") or metadata.get("file_path") or metadata.get("source")
+
+
+def _text_overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is also a prefix of right."""
+    for size in range(min(len(left), len(right), MAX_TEXT_OVERLAP), 0, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+class Passage:
+    """Contiguous text of one document, stitched from one or more retrieved chunks."""
+
+    def __init__(self, document: Document, rank: int):
+        metadata = document.metadata
+        self.metadata = metadata
+        self.text = document.page_content
+        self.rank = rank    # Best (lowest) search rank among the merged chunks
+        self.start: Optional[int] = metadata.get("start_index")
+        # Document offset just past the text (separators between chunks are not kept)
+        self.end: Optional[int] = None if self.start is None else self.start + len(self.text)
+        self.chunk: Optional[int] = metadata.get("chunk")   # Last chunk number merged in
+        self.page_start = metadata.get("page_start")
+        self.page_end = metadata.get("page_end")
+
+    @property
+    def position(self) -> Tuple[int, int]:
+        if self.start is not None:
+            return 0, self.start
+        return 1, self.chunk if self.chunk is not None else self.rank
+
+    def merge(self, other: "Passage") -> bool:
+        """Append the following passage if it overlaps or touches this one."""
+        if other.text in self.text:
+            # Same chunk retrieved twice (e.g. by both retrievers) or fully covered
+            pass
+        elif self.start is not None and other.start is not None:
+            if other.start > self.end + MERGE_GAP:
+                return False
+            if other.end > self.end:
+                overlap = self.end - other.start
+                self.text += other.text[overlap:] if overlap >= 0 else "\n" + other.text
+                self.end = other.end
+        elif self.chunk is not None and other.chunk is not None and other.chunk <= self.chunk + 1:
+            if other.chunk == self.chunk + 1:
+                # Older chunks carry no offsets; find the repeated span in the text
+                overlap = _text_overlap(self.text, other.text)
+                self.text += other.text[overlap:] if overlap else "\n" + other.text
+        else:
+            return False
+        self.rank = min(self.rank, other.rank)
+        self.chunk = max(self.chunk, other.chunk) if self.chunk is not None and other.chunk is not None else self.chunk
+        if other.page_start:
+            self.page_start = min(self.page_start or other.page_start, other.page_start)
+            self.page_end = max(self.page_end or other.page_end, other.page_end)
+        return True
+
+    def label(self) -> str:
+        source = self.metadata.get("source", "Unknown")
+        if self.page_start and self.page_end and self.page_end != self.page_start:
+            source += f", pages {self.page_start}-{self.page_end}"
+        elif self.page_start:
+            source += f", page {self.page_start}"
+        return source
+
+    def format(self, text: Optional[str] = None) -> str:
+        return f"[Source: {self.label()}]\n{self.text if text is None else text}\n\n---\n\n"
+
+
+def merge_passages(documents: List[Document]) -> List[Passage]:
+    """Group ranked chunks per document and stitch overlapping or adjacent ones, best first."""
+    groups = {}
+    for rank, document in enumerate(documents):
+        groups.setdefault(_document_key(document.metadata), []).append(Passage(document, rank))
+
+    passages = []
+    for group in groups.values():
+        group.sort(key=lambda passage: passage.position)
+        current = group[0]
+        for passage in group[1:]:
+            if not current.merge(passage):
+                passages.append(current)
+                current = passage
+        passages.append(current)
+    return sorted(passages, key=lambda passage: passage.rank)
+
+
+def assemble_context(documents: List[Document], token_budget: int) -> Tuple[str, int]:
+    """Format ranked chunks as prompt context within token_budget.
+
+    Returns the context and how many passages were left out for lack of budget.
+    Passages are chosen by relevance, then printed grouped by document in
+    reading order. The best passage is truncated rather than dropped if it
+    alone exceeds the budget.
+    """
+    passages = merge_passages(documents)
+    chosen = []
+    remaining = token_budget
+    for passage in passages:
+        cost = estimate_tokens(passage.format())
+        if cost <= remaining:
+            chosen.append((passage, None))
+            remaining -= cost
+        elif not chosen:
+            room = max(remaining - estimate_tokens(passage.format("")), 0) * CHARS_PER_TOKEN
+            chosen.append((passage, passage.text[:room].rstrip() + " ..."))
+            remaining = 0
+
+    # Reading order: documents by their best passage, passages by position
+    order = {}
+    for passage, _ in chosen:
+        order.setdefault(_document_key(passage.metadata), len(order))
+    chosen.sort(key=lambda item: (order[_document_key(item[0].metadata)], item[0].position))
+    context = "".join(passage.format(text) for passage, text in chosen)
+    return context, len(passages) - len(chosen)
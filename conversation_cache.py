@@ -0,0 +1,274 @@
+"""Conversation Cache - Per-(user, session) chat history kept in memory between messages.
+
+The Conversation table stays the source of truth: every message is still
+written there, and the cache is updated alongside it (write-through). A
+session's history is read from the database once, when it is first used
+after a restart or eviction; later messages in that session need no history
+query. Entries are evicted least recently used first.
+
+The agent sees the newest turns that fit in CHAT_HISTORY_TOKENS. Once the
+history outgrows that budget, the oldest turns are folded into a rolling
+summary kept on the ChatSession row (summary_until marks the last folded
+message), so the prompt stays bounded however long the session runs.
+Sessions loaded with more unsummarized messages than fit in memory (e.g.
+long sessions from before summaries existed) first fold those older
+messages into the summary, one history budget of them at a time. Only the
+newest BACKLOG_MAX_BUDGETS budgets of that backlog are folded (one summary
+call each); anything older is left out of the summary.
+"""
+
+import asyncio
+from typing import Dict, List, Optional
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import CONVERSATION_CACHE_SIZE, CHAT_HISTORY_TOKENS, CHAT_SUMMARY_TOKENS
+from context_assembler import estimate_tokens
+from db import async_session
+from llm_manager import summarize_conversation
+from lru_cache import LRUCache
+from models import ChatSession, Conversation
+
+HISTORY_ROLES = ("user", "assistant")
+HISTORY_LOAD_LIMIT = 200  # Most messages read when a session is loaded
+SUMMARY_KEEP = 0.5        # Fraction of the history budget left unsummarized after a fold
+BACKLOG_MAX_BUDGETS = 4   # Most history budgets of older messages folded when a session is loaded
+
+_conversations = LRUCache(CONVERSATION_CACHE_SIZE)
+_current_sessions: Dict[Optional[int], Optional[int]] = {}  # user id -> session shown in the UI
+_summary_tasks = set()  # Running summary updates (referenced so they are not garbage collected)
+
+
+class ConversationState:
+    """Rolling summary plus the not yet summarized user/assistant turns of one chat session."""
+
+    def __init__(self, user_id: Optional[int], session_id: int, history: Optional[List[dict]] = None,
+                 summary: Optional[str] = None, summary_until: Optional[int] = None):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.history: List[dict] = history or []  # {"id", "role", "content", "tokens"}, oldest first
+        self.summary = summary
+        self.summary_until = summary_until
+        # Oldest loaded message id while older unsummarized messages remain in the database
+        self.backlog_before: Optional[int] = None
+        self.summarizing = False
+
+    def append(self, message_id: int, role: str, content: str):
+        self.history.append({"id": message_id, "role": role, "content": content, "tokens": estimate_tokens(content)})
+
+    def _window_start(self, budget: int) -> int:
+        """Index of the oldest turn in the newest run of turns fitting in budget."""
+        start = len(self.history)
+        used = 0
+        for i in range(len(self.history) - 1, -1, -1):
+            used += self.history[i]["tokens"]
+            if used > budget:
+                break
+            start = i
+        return start
+
+    def pending_summary(self) -> List[dict]:
+        """Oldest turns to fold into the summary, once the history exceeds its budget."""
+        if sum(turn["tokens"] for turn in self.history) <= CHAT_HISTORY_TOKENS:
+            return []
+        # Fold down to part of the budget so the summary is not rewritten on every message
+        return self.history[:self._window_start(int(CHAT_HISTORY_TOKENS * SUMMARY_KEEP))]
+
+    def fold(self, summary: str, summary_until: int):
+        self.summary = summary
+        self.summary_until = summary_until
+        self.history = [turn for turn in self.history if turn["id"] > summary_until]
+
+    def messages(self, system_prompt: str, user_message: Optional[str] = None) -> List[dict]:
+        """Agent input: system prompt with the summary, the turns that fit the budget and the new message."""
+        if self.summary:
+            system_prompt += f"\n\nSUMMARY OF EARLIER CONVERSATION:\n{self.summary}"
+        budget = CHAT_HISTORY_TOKENS - (estimate_tokens(user_message) if user_message else 0)
+        window = self.history[self._window_start(max(budget, 0)):]
+        messages = [{"role": "system", "content": system_prompt}]
+        messages += [{"role": turn["role"], "content": turn["content"]} for turn in window]
+        if user_message is not None:
+            messages.append({"role": "user", "content": user_message})
+        return messages
+
+
+async def _load_state(s: AsyncSession, session: ChatSession) -> ConversationState:
+    # Newest messages first so the index stops after the window, whatever the session length
+    statement = select(Conversation).where(
+        Conversation.session_id == session.id,
+        Conversation.role.in_(HISTORY_ROLES)
+    )
+    if session.summary_until:
+        statement = statement.where(Conversation.id > session.summary_until)
+    statement = statement.order_by(Conversation.created_at.desc(), Conversation.id.desc()).limit(HISTORY_LOAD_LIMIT)
+
+    state = ConversationState(session.user_id, session.id, summary=session.summary, summary_until=session.summary_until)
+    rows = []
+    used = 0
+    truncated = False
+    for conv in await s.exec(statement):
+        # Keep up to twice the budget: the window plus what the next summary update folds
+        used += estimate_tokens(conv.content)
+        if rows and used > 2 * CHAT_HISTORY_TOKENS:
+            truncated = True
+            break
+        rows.append(conv)
+    for conv in reversed(rows):
+        state.append(conv.id, conv.role, conv.content)
+    if truncated or len(rows) == HISTORY_LOAD_LIMIT:
+        state.backlog_before = rows[-1].id
+    return state
+
+
+async def get_conversation(user_id: Optional[int], session_id: int) -> Optional[ConversationState]:
+    """Cached state of a session, loaded from the database on a miss.
+
+    Returns None if the session does not exist or belongs to another user.
+    """
+    key = (user_id, session_id)
+    found, state = _conversations.get(key)
+    if found:
+        return state
+    async with async_session() as s:
+        session = await s.get(ChatSession, session_id)
+        if not session or session.user_id != user_id:
+            return None
+        state = await _load_state(s, session)
+    _conversations.put(key, state)
+    return state
+
+
+def start_conversation(user_id: Optional[int], session_id: int) -> ConversationState:
+    """State for a session that was just created (nothing to load)."""
+    state = ConversationState(user_id, session_id)
+    _conversations.put((user_id, session_id), state)
+    return state
+
+
+def record_message(user_id: Optional[int], session_id: int, message_id: int, role: str, content: str):
+    """Add a message just saved to the Conversation table to the cached history, if cached."""
+    found, state = _conversations.peek((user_id, session_id))
+    if found:
+        state.append(message_id, role, content)
+
+
+async def _fold_turns(state: ConversationState, turns: List[dict]) -> bool:
+    """Summarize turns into the session's summary and save it. False if the session was deleted."""
+    summary = await summarize_conversation(state.summary, turns, CHAT_SUMMARY_TOKENS)
+    summary_until = turns[-1]["id"]
+    async with async_session() as s:
+        session = await s.get(ChatSession, state.session_id)
+        if not session:
+            return False
+        session.summary = summary
+        session.summary_until = summary_until
+        s.add(session)
+        await s.commit()
+    state.fold(summary, summary_until)
+    return True
+
+
+def _backlog_statement(state: ConversationState, columns=(Conversation,)):
+    statement = select(*columns).where(
+        Conversation.session_id == state.session_id,
+        Conversation.role.in_(HISTORY_ROLES),
+        Conversation.id < state.backlog_before
+    )
+    if state.summary_until:
+        statement = statement.where(Conversation.id > state.summary_until)
+    return statement
+
+
+async def _backlog_start(state: ConversationState) -> Optional[int]:
+    """Id of the oldest backlog message within the newest BACKLOG_MAX_BUDGETS history budgets."""
+    statement = _backlog_statement(state, (Conversation.id, Conversation.content))
+    statement = statement.order_by(Conversation.id.desc()).limit(BACKLOG_MAX_BUDGETS * HISTORY_LOAD_LIMIT)
+    start = None
+    used = 0
+    async with async_session() as s:
+        for message_id, content in await s.exec(statement):
+            used += estimate_tokens(content)
+            if start is not None and used > BACKLOG_MAX_BUDGETS * CHAT_HISTORY_TOKENS:
+                break
+            start = message_id
+    return start
+
+
+async def _fold_backlog(state: ConversationState) -> bool:
+    """Fold the unsummarized messages older than the loaded history, oldest first.
+
+    At most BACKLOG_MAX_BUDGETS summary calls: only the newest BACKLOG_MAX_BUDGETS
+    history budgets of the backlog are folded, older messages are skipped.
+    """
+    if state.backlog_before is None:
+        return True
+    start = await _backlog_start(state)
+    for _ in range(BACKLOG_MAX_BUDGETS):
+        if start is None:
+            break
+        statement = _backlog_statement(state).where(Conversation.id >= start)
+        statement = statement.order_by(Conversation.id).limit(HISTORY_LOAD_LIMIT)
+        async with async_session() as s:
+            rows = (await s.exec(statement)).all()
+        if not rows:
+            break
+
+        # One history budget per summary call, like a regular fold
+        turns = []
+        used = 0
+        for conv in rows:
+            tokens = estimate_tokens(conv.content)
+            if turns and used + tokens > CHAT_HISTORY_TOKENS:
+                break
+            turns.append({"id": conv.id, "role": conv.role, "content": conv.content, "tokens": tokens})
+            used += tokens
+        if not await _fold_turns(state, turns):
+            return False
+    state.backlog_before = None
+    return True
+
+
+async def update_summary(state: ConversationState):
+    """Fold the turns that outgrew the history budget into the session's rolling summary."""
+    if state.summarizing or (state.backlog_before is None and not state.pending_summary()):
+        return
+    state.summarizing = True
+    try:
+        if not await _fold_backlog(state):
+            return  # Deleted meanwhile
+        turns = state.pending_summary()
+        if turns:
+            await _fold_turns(state, turns)
+    except Exception as e:
+        # The turns stay in the history (or the database) and are folded on a later message
+        print(f"[Chat] Summary update failed for session {state.session_id}: {e}")
+    finally:
+        state.summarizing = False
+
+
+def schedule_summary_update(state: ConversationState):
+    """Update the summary in the background, off the response path."""
+    if state.summarizing or (state.backlog_before is None and not state.pending_summary()):
+        return
+    task = asyncio.create_task(update_summary(state))
+    _summary_tasks.add(task)
+    task.add_done_callback(_summary_tasks.discard)
+
+
+def drop_conversation(user_id: Optional[int], session_id: int):
+    _conversations.pop((user_id, session_id))
+    if _current_sessions.get(user_id) == session_id:
+        _current_sessions[user_id] = None
+
+
+def get_current_session(user_id: Optional[int]) -> Optional[int]:
+    return _current_sessions.get(user_id)
+
+
+def set_current_session(user_id: Optional[int], session_id: Optional[int]):
+    _current_sessions[user_id] = session_id
+
+
+def get_conversation_cache_stats() -> dict:
+    return {**_conversations.stats(), "users": len(_current_sessions)}
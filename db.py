@@ -1,11 +1,45 @@
 from sqlmodel import SQLModel, create_engine, Session
-from config import SQLITE_DB_URL
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event, inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from config import SQLITE_DB_URL, ASYNC_SQLITE_DB_URL
 
 engine = create_engine(SQLITE_DB_URL, echo=False, connect_args={"check_same_thread": False})
+# Async engine for the FastAPI endpoints: queries run on aiosqlite's thread, not the event loop.
+# The sync engine stays for the MCP server, ingestion workers and scripts.
+async_engine = create_async_engine(ASYNC_SQLITE_DB_URL, echo=False)
+
+@event.listens_for(async_engine.sync_engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers run while another process (MCP server, ingest worker) writes
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
 
 def init_db():
+    import models  # noqa: F401 - registers the tables on SQLModel.metadata
     SQLModel.metadata.create_all(engine)
+    migrate_db()
+
+def migrate_db():
+    """Add columns and indexes declared on models after their table was created."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(engine.dialect)
+                    conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+def async_session() -> AsyncSession:
+    """Session on the async engine; objects stay readable after commit (no lazy refresh)."""
+    return AsyncSession(async_engine, expire_on_commit=False)
@@ -0,0 +1,145 @@
+"""Ingest Queue - Runs document ingestion on background worker threads.
+
+Uploads enqueue a job and return immediately; workers call ingest_document and
+record progress on the job so the UI can poll /api/upload/jobs/{job_id}.
+"""
+
+import queue
+import threading
+import uuid
+from datetime import datetime
+from typing import Callable, Optional
+
+from config import INGEST_WORKERS, INGEST_QUEUE_SIZE
+
+MAX_FINISHED_JOBS = 200  # Finished jobs kept around for status polling
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+_queue: "queue.Queue[str]" = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+_workers = []
+_submit_lock = threading.Lock()  # Only submit_ingest puts, so a slot seen free under it stays free
+_claims_cleared = threading.Event()
+_claims_lock = threading.Lock()
+
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue is at capacity."""
+
+
+def _update(job_id: str, **fields):
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is not None:
+            job.update(fields)
+
+
+def _prune_finished():
+    finished = [j for j in _jobs.values() if j["status"] in ("done", "duplicate", "error")]
+    finished.sort(key=lambda j: j["finished_at"] or "")
+    for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del _jobs[job["id"]]
+
+
+def _worker():
+    from rag_manager import ingest_document, clear_ingest_claims
+
+    # Claims left by a previous run are dropped before this run's first job
+    with _claims_lock:
+        if not _claims_cleared.is_set():
+            try:
+                clear_ingest_claims()
+            except Exception as e:
+                print(f"[Ingest] Could not clear stale ingest claims: {e}")
+            _claims_cleared.set()
+
+    while True:
+        job_id = _queue.get()
+        with _jobs_lock:
+            job = dict(_jobs[job_id])
+        _update(job_id, status="running", started_at=datetime.now().isoformat())
+        try:
+            result = ingest_document(
+                job["file_path"],
+                job["metadata"],
+                uploaded_by=job["uploaded_by"],
+                content_hash=job["content_hash"],
+                remove_duplicate=True,
+                on_progress=lambda **progress: _update(job_id, **progress)
+            )
+            if "error" in result:
+                status = "error"
+            elif result.get("status") == "duplicate":
+                status = "duplicate"
+            else:
+                status = "done"
+            _update(job_id, status=status, result=result, error=result.get("error"))
+        except Exception as e:
+            _update(job_id, status="error", error=str(e))
+        finally:
+            _update(job_id, finished_at=datetime.now().isoformat())
+            with _jobs_lock:
+                _prune_finished()
+            _queue.task_done()
+
+
+def _ensure_workers():
+    with _jobs_lock:
+        while len(_workers) < INGEST_WORKERS:
+            thread = threading.Thread(target=_worker, name=f"ingest-worker-{len(_workers)}", daemon=True)
+            thread.start()
+            _workers.append(thread)
+
+
+def submit_ingest(file_path: str, file_name: str, metadata: Optional[dict] = None, uploaded_by: Optional[int] = None,
+                  content_hash: Optional[str] = None, on_accept: Optional[Callable[[], None]] = None) -> dict:
+    """Queue a file for ingestion. Raises QueueFullError when the queue is at capacity.
+
+    on_accept runs once the job has a queue slot and before any worker can see
+    it (e.g. to move the upload into place); if it raises, the job is dropped.
+    """
+    _ensure_workers()
+    job_id = uuid.uuid4().hex
+    job = {
+        "id": job_id,
+        "file": file_name,
+        "file_path": file_path,
+        "metadata": metadata or {},
+        "uploaded_by": uploaded_by,
+        "content_hash": content_hash,
+        "status": "queued",
+        "pages_total": None,
+        "pages_parsed": 0,
+        "chunks_total": None,
+        "chunks_embedded": 0,
+        "result": None,
+        "error": None,
+        "created_at": datetime.now().isoformat(),
+        "started_at": None,
+        "finished_at": None,
+    }
+    with _submit_lock:
+        if _queue.full():
+            raise QueueFullError(f"Ingestion queue is full ({INGEST_QUEUE_SIZE} jobs). Try again shortly.")
+        if on_accept is not None:
+            on_accept()
+        with _jobs_lock:
+            _jobs[job_id] = job
+        _queue.put_nowait(job_id)
+    return get_job(job_id)
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    """Public view of a job (None if unknown or pruned)."""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        public = {k: v for k, v in job.items() if k not in ("file_path", "metadata")}
+    public["queue_position"] = None
+    if public["status"] == "queued":
+        with _queue.mutex:
+            pending = list(_queue.queue)
+        if job_id in pending:
+            public["queue_position"] = pending.index(job_id) + 1
+    return public
@@ -1,12 +1,15 @@
 import asyncio
+import hashlib
+import json
+import time
 from langchain_mistralai import ChatMistralAI
 from langgraph.prebuilt import create_react_agent
 from langchain_core.messages.ai import AIMessageChunk
 from langchain_core.messages import ToolMessage
-from typing import AsyncGenerator, Dict, Any
+from typing import AsyncGenerator, Dict, Any, List, Optional
 
-from mcp_client import get_mcp_client
-from config import MISTRAL_API_KEY
+from mcp_client import get_tools
+from config import MISTRAL_API_KEY, AGENT_CACHE_TTL
 
 mistral_llm = ChatMistralAI(
     model="mistral-small-latest",
@@ -16,17 +19,92 @@ mistral_llm = ChatMistralAI(
     top_p=1
 )
 
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a corporate user and an AI assistant.
+Update the existing summary with the new messages. Keep names, numbers, decisions, open questions and
+anything the user asked to remember; drop small talk and raw tool output. Reply with the summary only,
+in at most {max_words} words."""
+SUMMARY_MESSAGE_CHARS = 4000  # Longest part of one message given to the summarizer
 
-async def create_agent():
-    client = await get_mcp_client()
-    tools = await client.get_tools()
-    agent = create_react_agent(mistral_llm, tools)
-    return agent
+
+# Compiled agent shared by all requests, rebuilt only when the MCP tool set changes
+_agent = None
+_tools_fingerprint: Optional[str] = None
+_tools_checked_at = 0.0
+_agent_lock = asyncio.Lock()
+
+
+def _fingerprint_tools(tools) -> str:
+    """Identity of the tool set: names, descriptions and argument schemas."""
+    schema = sorted(
+        (tool.name, tool.description or "", json.dumps(getattr(tool, "args", {}), sort_keys=True, default=str))
+        for tool in tools
+    )
+    return hashlib.sha256(json.dumps(schema).encode("utf-8")).hexdigest()
+
+
+async def get_agent(force_refresh: bool = False):
+    """Return the cached agent, re-listing MCP tools at most every AGENT_CACHE_TTL seconds.
+    
+    The graph is only recompiled when the tool list actually changed.
+    """
+    global _agent, _tools_fingerprint, _tools_checked_at
+    if _agent is not None and not force_refresh and time.monotonic() - _tools_checked_at < AGENT_CACHE_TTL:
+        return _agent
+    
+    async with _agent_lock:
+        # Another request may have refreshed while we waited
+        if _agent is not None and not force_refresh and time.monotonic() - _tools_checked_at < AGENT_CACHE_TTL:
+            return _agent
+        # Tools call through mcp_client's pooled sessions, not a new session per call
+        tools = await get_tools()
+        fingerprint = _fingerprint_tools(tools)
+        if _agent is None or fingerprint != _tools_fingerprint:
+            print(f"[Agent] Building agent with {len(tools)} MCP tools")
+            _agent = create_react_agent(mistral_llm, tools)
+            _tools_fingerprint = fingerprint
+        _tools_checked_at = time.monotonic()
+        return _agent
+
+
+def invalidate_agent():
+    """Force the next request to re-list MCP tools (e.g. after the server restarted)."""
+    global _tools_checked_at
+    _tools_checked_at = 0.0
+
+
+async def refresh_agent() -> dict:
+    """Re-list MCP tools now and rebuild the agent if they changed."""
+    previous = _tools_fingerprint
+    await get_agent(force_refresh=True)
+    return {"status": "rebuilt" if _tools_fingerprint != previous else "unchanged"}
+
+
+async def summarize_conversation(summary: Optional[str], turns: List[dict], max_tokens: int) -> str:
+    """Fold turns ({"role", "content"} dicts, oldest first) into an existing rolling summary."""
+    transcript = "\n\n".join(
+        f"{turn['role'].upper()}: {turn['content'][:SUMMARY_MESSAGE_CHARS]}" for turn in turns
+    )
+    response = await mistral_llm.ainvoke([
+        {"role": "system", "content": SUMMARY_PROMPT.format(max_words=int(max_tokens * 0.75))},
+        {"role": "user", "content": f"EXISTING SUMMARY:\n{summary or '(none)'}\n\nNEW MESSAGES:\n{transcript}"},
+    ])
+    # Keep the stored summary within its budget even if the model runs long
+    return response.content.strip()[:max_tokens * 4]
 
 
 async def stream_agent_response(messages) -> AsyncGenerator[Dict[str, Any], None]:
     """Streams incremental content with tool usage info."""
-    agent = await create_agent()
+    agent = await get_agent()
+    try:
+        async for data in _stream_agent(agent, messages):
+            yield data
+    except Exception:
+        # A failing tool call may mean the MCP server changed; re-list tools next time
+        invalidate_agent()
+        raise
+
+
+async def _stream_agent(agent, messages) -> AsyncGenerator[Dict[str, Any], None]:
     response_iter = agent.astream({"messages": messages}, stream_mode="messages")
     
     async for chunk in response_iter:
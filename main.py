@@ -1,4 +1,6 @@
 import json
+import hashlib
+import uuid
 import subprocess
 import platform
 import webbrowser
@@ -11,16 +13,23 @@ from fastapi import FastAPI, Request, Form, HTTPException, status, UploadFile, F
 from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, PlainTextResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 from sqlmodel import Session
 from sqlalchemy.orm import sessionmaker, scoped_session
 from pydantic import BaseModel
 
-from db import init_db, engine
+from db import init_db, engine, async_session
 from db_init import seed
-from models import Employee, Project, Task, Conversation, ChatSession
-from auth import verify_password, get_password_hash, create_access_token, decode_token, get_user_by_email
-from config import ACCESS_TOKEN_EXPIRE_MINUTES
-from llm_manager import stream_agent_response
+from models import Employee, Project, Task, Conversation, ChatSession, UploadedFile
+from auth import verify_password, get_password_hash, create_access_token, decode_token, get_user_by_email, get_user_by_email_async
+from config import ACCESS_TOKEN_EXPIRE_MINUTES, MAX_UPLOAD_BYTES
+from llm_manager import stream_agent_response, refresh_agent
+from mcp_client import close_mcp_sessions
+from pdf_extract import shutdown_pdf_workers
+from conversation_cache import (
+    get_conversation, start_conversation, record_message, drop_conversation,
+    get_current_session, set_current_session, schedule_summary_update
+)
 
 app = FastAPI()
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -88,13 +97,25 @@ RESPONSE FORMAT:
 
 
 PORT = 8080
-current_user_data = {}
-current_session_id = None  # Track current chat session
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Bytes read per step when streaming an upload to disk
 
 
-def get_system_prompt():
+def get_user_data(user: Employee) -> dict:
+    """Profile of the logged-in user given to the agent."""
+    return {
+        "id": user.id,
+        "email": user.email,
+        "name": user.full_name or user.email,
+        "role": user.role,
+        "department": user.department,
+        "access_level": user.access_level,
+        "access_name": {1: "read-only", 2: "write", 3: "admin"}.get(user.access_level, "unknown")
+    }
+
+
+def get_system_prompt(current_user_data: Optional[dict] = None):
     """Generate system prompt with current user and datetime context."""
     # Get current datetime info
     now = datetime.now()
@@ -115,9 +136,6 @@ def get_system_prompt():
     
     return SYSTEM_PROMPT_TEMPLATE.format(user_context=user_context, datetime_context=datetime_context)
 
-
-messages = [{"role": "system", "content": get_system_prompt()}]
-
 class Message(BaseModel):
     user_input: str
     session_id: Optional[int] = None
@@ -136,6 +154,12 @@ def startup():
     print("Application started and browser opened.")
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    await close_mcp_sessions()
+    await run_in_threadpool(shutdown_pdf_workers)
+
+
 # -------- Templates --------
 @app.get("/", response_class=HTMLResponse)
 def index(request: Request):
@@ -166,27 +190,11 @@ def login_get(request: Request, error: str = None):
 
 @app.post("/login")
 def login_post(request: Request, email: str = Form(...), password: str = Form(...)):
-    global current_user_data, messages
     with Session(engine) as s:
         user = get_user_by_email(s, email)
         if not user or not verify_password(password, user.hashed_password):
             return templates.TemplateResponse("login.html", {"request": request, "error": "Incorrect credentials"})
 
-        # Store full user details in cache
-        current_user_data = {
-            "id": user.id,
-            "email": user.email,
-            "name": user.full_name or user.email,
-            "role": user.role,
-            "department": user.department,
-            "access_level": user.access_level,
-            "access_name": {1: "read-only", 2: "write", 3: "admin"}.get(user.access_level, "unknown")
-        }
-        
-        # Refresh messages with updated user context
-        messages.clear()
-        messages.append({"role": "system", "content": get_system_prompt()})
-        
         token = create_access_token(user.email, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
         res = RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
         res.set_cookie(key="access_token", value=token, httponly=True, samesite="lax")
@@ -214,12 +222,16 @@ def logout():
 
 @app.post("/clearcache")
 def clearcache(request: Request):
-    from sqlmodel import select
-    global current_session_id
-    
-    messages.clear()
-    messages.append({"role": "system", "content": get_system_prompt()})
-    current_session_id = None  # Will create new session on next message
+    token = request.cookies.get("access_token")
+    payload = decode_token(token) if token else None
+    if payload:
+        with Session(engine) as s:
+            user = get_user_by_email(s, payload.get("sub"))
+            if user:
+                session_id = get_current_session(user.id)
+                if session_id:
+                    drop_conversation(user.id, session_id)
+                set_current_session(user.id, None)  # Will create new session on next message
     
     # Note: We no longer delete conversations - just clear in-memory cache
     # Previous conversations are preserved in the database
@@ -243,88 +255,62 @@ def get_current_user_from_token(request: Request):
 @app.post("/api/chat/stream", response_class=PlainTextResponse)
 async def chat_stream(request: Request, msg: Message):
     """Streams the agent response as Server-Sent Events (SSE)."""
-    global current_session_id, messages, current_user_data
-    
     # Get current user ID for saving conversation
     user_id = None
+    current_user_data = {}
     token = request.cookies.get("access_token")
     if token:
         payload = decode_token(token)
         if payload:
-            with Session(engine) as s:
-                user = get_user_by_email(s, payload.get("sub"))
+            async with async_session() as s:
+                user = await get_user_by_email_async(s, payload.get("sub"))
                 if user:
                     user_id = user.id
-                    # Update user context
-                    current_user_data = {
-                        "id": user.id,
-                        "email": user.email,
-                        "name": user.full_name or user.email,
-                        "role": user.role,
-                        "department": user.department,
-                        "access_level": user.access_level,
-                        "access_name": {1: "read-only", 2: "write", 3: "admin"}.get(user.access_level, "unknown")
-                    }
-    
-    # Determine session_id - prefer from request, fall back to global
-    session_id = msg.session_id if (msg.session_id is not None and msg.session_id > 0) else current_session_id
-    
-    # ALWAYS reload messages from database when we have a session_id
-    # This ensures the AI has the COMPLETE and CORRECT conversation context
-    if session_id:
-        from sqlmodel import select
-        with Session(engine) as s:
-            # Clear and reload messages from database
-            messages.clear()
-            messages.append({"role": "system", "content": get_system_prompt()})
-            
-            statement = select(Conversation).where(
-                Conversation.session_id == session_id
-            ).order_by(Conversation.created_at.asc())
-            
-            conversations = s.exec(statement).all()
-            
-            for conv in conversations:
-                if conv.role in ["user", "assistant"]:
-                    messages.append({"role": conv.role, "content": conv.content})
-            
-            current_session_id = session_id
-    else:
-        # No session yet - just refresh system prompt
-        messages.clear()
-        messages.append({"role": "system", "content": get_system_prompt()})
+                    current_user_data = get_user_data(user)
     
-    # Limit message history to prevent token overflow
-    while len(messages) > 12:
-        # Keep system prompt (index 0), remove oldest user/assistant pair
-        if len(messages) > 2:
-            messages.pop(1)
+    # Determine session_id - prefer from request, fall back to the user's current session
+    session_id = msg.session_id if (msg.session_id is not None and msg.session_id > 0) else get_current_session(user_id)
     
-    if msg.user_input:
-        with Session(engine) as s:
-            # Create new session if none exists
-            if not session_id:
+    # History comes from the per-session cache; the database is only read on a cache miss
+    conversation = None
+    if session_id:
+        conversation = await get_conversation(user_id, session_id)
+        if conversation is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        set_current_session(user_id, session_id)
+    
+    system_prompt = get_system_prompt(current_user_data)
+    if not msg.user_input:
+        messages = conversation.messages(system_prompt) if conversation else [{"role": "system", "content": system_prompt}]
+    else:
+        # Create new session if none exists
+        if not session_id:
+            async with async_session() as s:
                 new_session = ChatSession(
                     user_id=user_id,
                     preview=msg.user_input[:50] + ("..." if len(msg.user_input) > 50 else "")
                 )
                 s.add(new_session)
-                s.commit()
-                s.refresh(new_session)
+                await s.commit()
+                await s.refresh(new_session)
                 session_id = new_session.id
-                current_session_id = session_id
+            conversation = start_conversation(user_id, session_id)
+            set_current_session(user_id, session_id)
         
         # Include user context in the user message itself
         user_msg = msg.user_input
         if current_user_data:
             user_msg = f"[Context: Current user is {current_user_data.get('name', 'unknown')} with access level {current_user_data.get('access_level', 1)}]\n\n{msg.user_input}"
-        messages.append({"role": "user", "content": user_msg})
+        messages = conversation.messages(system_prompt, user_msg)
         
-        # Save user message to database
-        with Session(engine) as s:
+        # Save user message to database; history keeps the message without the context prefix
+        async with async_session() as s:
             conv = Conversation(session_id=session_id, user_id=user_id, role="user", content=msg.user_input)
             s.add(conv)
-            s.commit()
+            await s.flush()
+            message_id = conv.id
+            await s.commit()
+        record_message(user_id, session_id, message_id, "user", msg.user_input)
 
     async def event_generator():
         try:
@@ -341,10 +327,8 @@ async def chat_stream(request: Request, msg: Message):
                     full_response += data["content"]
                     yield f"data: {json.dumps({'content': data['content']})}\n\n"
 
-            messages.append({"role": "assistant", "content": full_response})
-            
             # Save assistant response to database
-            with Session(engine) as s:
+            async with async_session() as s:
                 conv = Conversation(
                     session_id=session_id,
                     user_id=user_id, 
@@ -353,10 +337,15 @@ async def chat_stream(request: Request, msg: Message):
                     tool_name=",".join(tools_used) if tools_used else None
                 )
                 s.add(conv)
-                s.commit()
+                await s.flush()
+                message_id = conv.id
+                await s.commit()
+            record_message(user_id, session_id, message_id, "assistant", full_response)
+            if conversation:
+                schedule_summary_update(conversation)
             
             # Send done signal
-            yield f"data: {json.dumps({'done': True})}\n\n"
+            yield f"data: {json.dumps({'done': True, 'session_id': session_id})}\n\n"
         except Exception as e:
             yield f"data: {json.dumps({'error': str(e)})}\n\n"
     return StreamingResponse(event_generator(), media_type="text/event-stream")
@@ -394,10 +383,55 @@ def get_analytics():
 
 
 # -------- File Upload for RAG --------
+class UploadTooLargeError(Exception):
+    pass
+
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """Reject oversized uploads from their Content-Length before the body is read."""
+    if request.url.path == "/api/upload":
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+            return JSONResponse(
+                content={"error": f"File too large (limit {MAX_UPLOAD_BYTES // (1024 * 1024)} MB)"},
+                status_code=413
+            )
+    return await call_next(request)
+
+
+async def save_upload(file: UploadFile, destination: Path):
+    """Stream an upload to a temp file next to destination, hashing as it goes.
+    
+    A failed or oversized upload never leaves a partial file behind. The caller
+    renames the temp file into place (or removes it) once the upload is
+    accepted. Returns (temp path, size, sha256 hex digest).
+    """
+    tmp_path = destination.with_name(f".{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise UploadTooLargeError(f"File too large (limit {MAX_UPLOAD_BYTES // (1024 * 1024)} MB)")
+                digest.update(chunk)
+                await run_in_threadpool(out.write, chunk)
+    except BaseException:
+        if tmp_path.exists():
+            os.remove(tmp_path)
+        raise
+    return tmp_path, size, digest.hexdigest()
+
+
 @app.post("/api/upload")
 async def upload_file(request: Request, file: UploadFile = File(...)):
-    """Upload a file for RAG processing."""
-    from rag_manager import ingest_document
+    """Upload a file and queue it for RAG processing (returns immediately with a job id)."""
+    from ingest_queue import submit_ingest, QueueFullError
     
     # Check authentication
     token = request.cookies.get("access_token")
@@ -409,8 +443,8 @@ async def upload_file(request: Request, file: UploadFile = File(...)):
         return JSONResponse(content={"error": "Invalid token"}, status_code=401)
     
     # Check user access level (need at least write access)
-    with Session(engine) as s:
-        user = get_user_by_email(s, payload.get("sub"))
+    async with async_session() as s:
+        user = await get_user_by_email_async(s, payload.get("sub"))
         if not user:
             return JSONResponse(content={"error": "User not found"}, status_code=401)
         
@@ -420,27 +454,60 @@ async def upload_file(request: Request, file: UploadFile = File(...)):
         # if user_access < 2:
         #     return JSONResponse(content={"error": f"Write access required. Your level: {user_access}"}, status_code=403)
     
+    tmp_path = None
     try:
         # Ensure upload directory exists
         UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
         
-        # Save file
-        file_path = UPLOAD_DIR / file.filename
-        content = await file.read()
-        
-        with open(file_path, "wb") as f:
-            f.write(content)
-        
-        print(f"File saved to: {file_path}, size: {len(content)} bytes")
-        
-        # Ingest into RAG with user ID
-        result = ingest_document(str(file_path), {"uploaded_by": user.email}, uploaded_by=user.id)
-        print(f"Ingest result: {result}")
-        
-        return JSONResponse(content=result)
+        # Stream file to disk (never held in memory as a whole)
+        file_name = Path(file.filename).name
+        file_path = UPLOAD_DIR / file_name
+        tmp_path, size, content_hash = await save_upload(file, file_path)
+        
+        # Ingest into RAG with user ID on a background worker; the file only
+        # replaces uploads/<name> once the job is accepted
+        job = submit_ingest(str(file_path), file_name, {"uploaded_by": user.email}, uploaded_by=user.id,
+                            content_hash=content_hash, on_accept=lambda: os.replace(tmp_path, file_path))
+        print(f"File saved to: {file_path}, size: {size} bytes")
+        print(f"Ingest job queued: {job['id']} for {file_name}")
+        
+        return JSONResponse(content={"status": "queued", "file": file_name, "job_id": job["id"], "job": job}, status_code=202)
+    except UploadTooLargeError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=413)
+    except QueueFullError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=503)
     except Exception as e:
         print(f"Upload error: {e}")
         return JSONResponse(content={"error": str(e)}, status_code=500)
+    finally:
+        # Left over when the job was not accepted
+        if tmp_path is not None and tmp_path.exists():
+            os.remove(tmp_path)
+
+
+@app.get("/api/upload/jobs/{job_id}")
+async def get_upload_job(request: Request, job_id: str):
+    """Progress of a queued ingestion job (pages parsed, chunks embedded, finished state)."""
+    from ingest_queue import get_job
+    
+    token = request.cookies.get("access_token")
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    payload = decode_token(token)
+    if not payload:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    
+    async with async_session() as s:
+        user = await get_user_by_email_async(s, payload.get("sub"))
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+    
+    job = get_job(job_id)
+    if not job or (job["uploaded_by"] != user.id and user.access_level < 3):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return JSONResponse(content=job)
 
 
 @app.get("/api/documents")
@@ -452,10 +519,63 @@ async def list_documents(request: Request):
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    docs = list_ingested_documents()
+    docs = await run_in_threadpool(list_ingested_documents)
     return JSONResponse(content={"documents": docs})
 
 
+@app.delete("/api/documents/{file_id}")
+async def delete_document_endpoint(request: Request, file_id: int):
+    """Remove one uploaded document from the RAG system (uploader or admin)."""
+    from rag_manager import delete_document
+    
+    token = request.cookies.get("access_token")
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    payload = decode_token(token)
+    if not payload:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    
+    async with async_session() as s:
+        user = await get_user_by_email_async(s, payload.get("sub"))
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        uploaded_file = await s.get(UploadedFile, file_id)
+        if not uploaded_file or not uploaded_file.is_active:
+            raise HTTPException(status_code=404, detail="Document not found")
+        if uploaded_file.uploaded_by != user.id and user.access_level < 3:
+            raise HTTPException(status_code=403, detail="Only the uploader or an admin can delete this document")
+    
+    result = await run_in_threadpool(delete_document, file_id)
+    if "error" in result:
+        return JSONResponse(content=result, status_code=404)
+    return JSONResponse(content=result)
+
+
+@app.post("/api/agent/refresh")
+async def refresh_agent_endpoint(request: Request):
+    """Re-list MCP tools and rebuild the chat agent if they changed (admin only)."""
+    token = request.cookies.get("access_token")
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    payload = decode_token(token)
+    if not payload:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    
+    async with async_session() as s:
+        user = await get_user_by_email_async(s, payload.get("sub"))
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        if user.access_level < 3:
+            raise HTTPException(status_code=403, detail="Admin access required")
+    
+    try:
+        return JSONResponse(content=await refresh_agent())
+    except Exception as e:
+        return JSONResponse(content={"error": f"Could not reach the MCP server: {e}"}, status_code=502)
+
+
 @app.get("/api/user/access")
 async def get_user_access(request: Request):
     """Get current user's access level."""
@@ -467,8 +587,8 @@ async def get_user_access(request: Request):
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    with Session(engine) as s:
-        user = get_user_by_email(s, payload.get("sub"))
+    async with async_session() as s:
+        user = await get_user_by_email_async(s, payload.get("sub"))
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
         
@@ -482,7 +602,6 @@ async def get_user_access(request: Request):
 @app.get("/api/conversations")
 async def get_conversations(request: Request, session_id: int = None, limit: int = 50):
     """Get conversation history for current user."""
-    global current_session_id
     from sqlmodel import select
     
     token = request.cookies.get("access_token")
@@ -493,8 +612,8 @@ async def get_conversations(request: Request, session_id: int = None, limit: int
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    with Session(engine) as s:
-        user = get_user_by_email(s, payload.get("sub"))
+    async with async_session() as s:
+        user = await get_user_by_email_async(s, payload.get("sub"))
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
         
@@ -503,16 +622,17 @@ async def get_conversations(request: Request, session_id: int = None, limit: int
         
         if not target_session_id:
             # If no session specified and no current session, get the most recent one
+            current_session_id = get_current_session(user.id)
             if not current_session_id:
-                recent_session = s.exec(
+                recent_session = (await s.exec(
                     select(ChatSession)
                     .where(ChatSession.user_id == user.id)
                     .where(ChatSession.is_active == True)
                     .order_by(ChatSession.created_at.desc())
                     .limit(1)
-                ).first()
+                )).first()
                 if recent_session:
-                    current_session_id = recent_session.id
+                    set_current_session(user.id, recent_session.id)
                     target_session_id = recent_session.id
             else:
                 target_session_id = current_session_id
@@ -521,12 +641,13 @@ async def get_conversations(request: Request, session_id: int = None, limit: int
             # No sessions exist for this user
             return JSONResponse(content={"conversations": [], "session_id": None})
         
+        # The latest `limit` messages, returned oldest first
         statement = select(Conversation).where(
             Conversation.user_id == user.id,
             Conversation.session_id == target_session_id
-        ).order_by(Conversation.created_at.asc()).limit(limit)
+        ).order_by(Conversation.created_at.desc(), Conversation.id.desc()).limit(limit)
         
-        conversations = s.exec(statement).all()
+        conversations = list(reversed((await s.exec(statement)).all()))
         
         return JSONResponse(content={
             "conversations": [
@@ -557,8 +678,8 @@ async def get_sessions(request: Request, limit: int = 20):
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    with Session(engine) as s:
-        user = get_user_by_email(s, payload.get("sub"))
+    async with async_session() as s:
+        user = await get_user_by_email_async(s, payload.get("sub"))
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
         
@@ -567,7 +688,7 @@ async def get_sessions(request: Request, limit: int = 20):
             ChatSession.is_active == True
         ).order_by(ChatSession.created_at.desc()).limit(limit)
         
-        sessions = s.exec(statement).all()
+        sessions = (await s.exec(statement)).all()
         
         return JSONResponse(content={
             "sessions": [
@@ -578,16 +699,13 @@ async def get_sessions(request: Request, limit: int = 20):
                 }
                 for sess in sessions
             ],
-            "current_session_id": current_session_id
+            "current_session_id": get_current_session(user.id)
         })
 
 
 @app.post("/api/conversations/sessions/{session_id}/switch")
 async def switch_session(request: Request, session_id: int):
     """Switch to an existing chat session."""
-    global current_session_id, messages, current_user_data
-    from sqlmodel import select
-    
     token = request.cookies.get("access_token")
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
@@ -596,57 +714,29 @@ async def switch_session(request: Request, session_id: int):
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    with Session(engine) as s:
-        user = get_user_by_email(s, payload.get("sub"))
+    async with async_session() as s:
+        user = await get_user_by_email_async(s, payload.get("sub"))
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
-        
-        # Verify session belongs to user
-        session = s.get(ChatSession, session_id)
-        if not session or session.user_id != user.id:
-            raise HTTPException(status_code=404, detail="Session not found")
-        
-        # Update current user data context
-        current_user_data = {
-            "id": user.id,
-            "email": user.email,
-            "name": user.full_name or user.email,
-            "role": user.role,
-            "department": user.department,
-            "access_level": user.access_level,
-            "access_name": {1: "read-only", 2: "write", 3: "admin"}.get(user.access_level, "unknown")
-        }
-        
-        # Load messages from this session into memory with fresh system prompt
-        messages.clear()
-        messages.append({"role": "system", "content": get_system_prompt()})
-        
-        statement = select(Conversation).where(
-            Conversation.session_id == session_id
-        ).order_by(Conversation.created_at.asc())
-        
-        conversations = s.exec(statement).all()
-        loaded_count = len(conversations)
-        for conv in conversations:
-            if conv.role in ["user", "assistant"]:
-                messages.append({"role": conv.role, "content": conv.content})
     
-    # Update global session ID OUTSIDE the db session
-    current_session_id = session_id
+    # Loads the session's history into the cache (verifies it belongs to the user)
+    conversation = await get_conversation(user.id, session_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    set_current_session(user.id, session_id)
     
     return JSONResponse(content={
         "success": True,
         "session_id": session_id,
-        "message_count": loaded_count,
-        "messages_in_memory": len(messages),
-        "user": current_user_data.get("name")
+        "message_count": len(conversation.history),
+        "messages_in_memory": len(conversation.history) + 1,
+        "user": user.full_name or user.email
     })
 
 
 @app.delete("/api/conversations/sessions/{session_id}")
 async def delete_session(request: Request, session_id: int):
     """Delete a chat session and all its messages."""
-    global current_session_id, messages
     from sqlmodel import select, delete as sql_delete
     
     token = request.cookies.get("access_token")
@@ -657,28 +747,25 @@ async def delete_session(request: Request, session_id: int):
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    with Session(engine) as s:
-        user = get_user_by_email(s, payload.get("sub"))
+    async with async_session() as s:
+        user = await get_user_by_email_async(s, payload.get("sub"))
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
         
         # Verify session belongs to user
-        session = s.get(ChatSession, session_id)
+        session = await s.get(ChatSession, session_id)
         if not session or session.user_id != user.id:
             raise HTTPException(status_code=404, detail="Session not found")
         
         # Delete all messages in this session
-        s.exec(sql_delete(Conversation).where(Conversation.session_id == session_id))
+        await s.exec(sql_delete(Conversation).where(Conversation.session_id == session_id))
         
         # Delete the session
-        s.delete(session)
-        s.commit()
+        await s.delete(session)
+        await s.commit()
         
-        # If this was the current session, reset
-        if current_session_id == session_id:
-            current_session_id = None
-            messages.clear()
-            messages.append({"role": "system", "content": get_system_prompt()})
+        # Forget its cached history; resets the current session if this was it
+        drop_conversation(user.id, session_id)
         
         return JSONResponse(content={"success": True, "deleted_session_id": session_id})
 
@@ -686,8 +773,6 @@ async def delete_session(request: Request, session_id: int):
 @app.post("/api/conversations/sessions/new")
 async def create_new_session(request: Request):
     """Create a new empty chat session."""
-    global current_session_id, messages
-    
     token = request.cookies.get("access_token")
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
@@ -696,18 +781,16 @@ async def create_new_session(request: Request):
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    with Session(engine) as s:
-        user = get_user_by_email(s, payload.get("sub"))
+    async with async_session() as s:
+        user = await get_user_by_email_async(s, payload.get("sub"))
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
         
-        # Reset in-memory messages - don't create DB session yet
+        # Don't create DB session yet
         # Session will be created on first message with proper preview
-        messages.clear()
-        messages.append({"role": "system", "content": get_system_prompt()})
         
         # Clear current session - new one will be created on first message
-        current_session_id = None
+        set_current_session(user.id, None)
         
         return JSONResponse(content={
             "success": True,
@@ -1,16 +1,31 @@
 import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, List, TypeVar
+
+import anyio
+import httpx
+from langchain_core.tools import StructuredTool, ToolException
 from langchain_mcp_adapters.client import MultiServerMCPClient
-from config import MCP_SERVER_URL
+from config import MCP_SERVER_URL, MCP_POOL_SIZE, MCP_PING_AFTER
+
+SERVER_NAME = "general"
+PING_TIMEOUT = 5  # Seconds a health check may take before the session is replaced
+# The session's connection is gone and the request never reached the server, so it is safe to resend
+UNSENT_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError, httpx.ConnectError)
+
+T = TypeVar("T")
 
 # Simple wrapper to initialize mcp client and expose a getter
 _mcp_client = None
+_session_pool = None
 
 async def init_mcp_client():
     global _mcp_client
     if _mcp_client is None:
         # Accept a dict mapping server names to transport config
         servers = {
-            "general": {
+            SERVER_NAME: {
                 "url": MCP_SERVER_URL,
                 "transport": "streamable_http"
             }
@@ -23,3 +38,169 @@ async def get_mcp_client():
     if _mcp_client is None:
         await init_mcp_client()
     return _mcp_client
+
+
+class _PooledSession:
+    """An initialized MCP session kept open by its own task until closed."""
+
+    def __init__(self, session, task: asyncio.Task, closing: asyncio.Event):
+        self.session = session
+        self.task = task
+        self.closing = closing
+        self.last_used = time.monotonic()
+
+    async def close(self):
+        self.closing.set()
+        try:
+            await asyncio.wait_for(self.task, PING_TIMEOUT)
+        except Exception:
+            self.task.cancel()
+
+
+class MCPSessionPool:
+    """Long-lived MCP sessions to one server, reused across tool calls and chat requests.
+
+    At most `size` calls run on the server at once. Sessions idle for longer
+    than MCP_PING_AFTER seconds are pinged before reuse and replaced if the
+    server stopped answering; a session whose call fails is dropped. run()
+    resends a request once on a new session when the connection was lost
+    before it could be sent (e.g. the server restarted).
+    """
+
+    def __init__(self, client: MultiServerMCPClient, server_name: str, size: int):
+        self.client = client
+        self.server_name = server_name
+        self.size = size
+        self._idle: List[_PooledSession] = []
+        self._semaphore = asyncio.Semaphore(size)
+        self.stats = {"opened": 0, "reused": 0, "replaced": 0, "dropped": 0, "retried": 0}
+
+    async def _open(self) -> _PooledSession:
+        # The transport's task groups must be entered and exited by the same task,
+        # so each session lives inside a task that holds it open until closed
+        ready = asyncio.get_running_loop().create_future()
+        closing = asyncio.Event()
+
+        async def hold_open():
+            try:
+                async with self.client.session(self.server_name) as session:
+                    ready.set_result(session)
+                    await closing.wait()
+            except Exception as e:
+                if not ready.done():
+                    ready.set_exception(e)
+                else:
+                    print(f"[MCP] Session to {self.server_name} closed with error: {e}")
+
+        task = asyncio.create_task(hold_open())
+        session = await ready
+        self.stats["opened"] += 1
+        return _PooledSession(session, task, closing)
+
+    async def _healthy(self, pooled: _PooledSession) -> bool:
+        if pooled.task.done():
+            return False
+        if time.monotonic() - pooled.last_used < MCP_PING_AFTER:
+            return True
+        try:
+            await asyncio.wait_for(pooled.session.send_ping(), PING_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+    async def _acquire(self) -> _PooledSession:
+        while self._idle:
+            pooled = self._idle.pop()
+            if await self._healthy(pooled):
+                self.stats["reused"] += 1
+                return pooled
+            self.stats["replaced"] += 1
+            await pooled.close()
+        return await self._open()
+
+    @asynccontextmanager
+    async def session(self, fresh: bool = False):
+        """Borrow a connected session for one or more requests (fresh: open a new one)."""
+        async with self._semaphore:
+            pooled = await self._open() if fresh else await self._acquire()
+            try:
+                yield pooled.session
+            except BaseException:
+                # The session may be half-way through a request; never hand it out again
+                self.stats["dropped"] += 1
+                await pooled.close()
+                raise
+            pooled.last_used = time.monotonic()
+            self._idle.append(pooled)
+
+    async def run(self, request: Callable[..., Awaitable[T]]) -> T:
+        """Await request(session) on a pooled session, retrying once on a new session if it was never sent."""
+        try:
+            async with self.session() as session:
+                return await request(session)
+        except UNSENT_ERRORS as e:
+            self.stats["retried"] += 1
+            print(f"[MCP] Connection to {self.server_name} lost ({type(e).__name__}); retrying on a new session")
+        async with self.session(fresh=True) as session:
+            return await request(session)
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for pooled in idle:
+            await pooled.close()
+
+
+async def get_session_pool() -> MCPSessionPool:
+    global _session_pool
+    if _session_pool is None:
+        _session_pool = MCPSessionPool(await get_mcp_client(), SERVER_NAME, MCP_POOL_SIZE)
+    return _session_pool
+
+
+def _convert_call_result(result):
+    """Split an MCP CallToolResult into LangChain (content, artifact)."""
+    texts, artifacts = [], []
+    for item in result.content:
+        if getattr(item, "type", None) == "text":
+            texts.append(item.text)
+        else:
+            artifacts.append(item)
+    content = "\n".join(texts)
+    if result.isError:
+        raise ToolException(content or "Tool call failed")
+    return content, artifacts or None
+
+
+def _pooled_tool(pool: MCPSessionPool, tool) -> StructuredTool:
+    async def call_tool(**arguments):
+        result = await pool.run(lambda session: session.call_tool(tool.name, arguments))
+        return _convert_call_result(result)
+
+    return StructuredTool(
+        name=tool.name,
+        description=tool.description or "",
+        args_schema=tool.inputSchema,
+        coroutine=call_tool,
+        response_format="content_and_artifact",
+    )
+
+
+async def get_tools() -> List[StructuredTool]:
+    """LangChain tools for every MCP tool, all calling through the shared session pool."""
+    pool = await get_session_pool()
+
+    async def list_all(session):
+        listed = await session.list_tools()
+        tools = list(listed.tools)
+        while getattr(listed, "nextCursor", None):
+            listed = await session.list_tools(cursor=listed.nextCursor)
+            tools.extend(listed.tools)
+        return tools
+
+    return [_pooled_tool(pool, tool) for tool in await pool.run(list_all)]
+
+
+async def close_mcp_sessions():
+    """Close pooled sessions (application shutdown)."""
+    if _session_pool is not None:
+        await _session_pool.close()
@@ -27,8 +27,8 @@ from mcp.server.fastmcp import FastMCP
 
 from config import SQLITE_DB_URL, MCP_SERVER_PORT
 from models import Employee, Project, Task, Document, ACCESS_LEVELS
-from main import Message, chat_stream, messages, current_user_data
-from rag_manager import ingest_document, query_documents, list_ingested_documents, clear_documents
+from main import Message, chat_stream
+from rag_manager import ingest_document, query_documents, list_ingested_documents, clear_documents, delete_document, get_vector_store_stats
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 
@@ -38,6 +38,8 @@ SMTP_HOST = os.getenv("SMTP_HOST")
 SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
 SMTP_USER = os.getenv("SMTP_USER")
 SMTP_PASS = os.getenv("SMTP_PASS")
+# The MCP server runs in its own process, so the chat app's per-request user is not visible here
+current_user_data = {}
 
 
 def get_current_user_access_level() -> int:
@@ -401,7 +403,6 @@ async def _reminder_task(seconds: float, msg: str):
     await asyncio.sleep(seconds)
     logging.info(f"[Reminder] {msg}")
     m = Message(user_input = f"[Reminder] {msg}")
-    messages.append({"role": "user", "content": m.user_input})
     await chat_stream(m)
 
 
@@ -425,7 +426,7 @@ def set_reminder(seconds: float, msg: str) -> dict:
 
 @mcp.tool(name="health_check", description="Server status")
 def health_check() -> dict:
-    return {"status": "ok", "time": datetime.now(), "db_exists": os.path.exists(DB_PATH)}
+    return {"status": "ok", "time": datetime.now(), "db_exists": os.path.exists(DB_PATH), "vector_store": get_vector_store_stats()}
 
 
 # ===== Delete Tools (Admin only) =====
@@ -477,9 +478,18 @@ def delete_task(task_id: int) -> dict:
 
 # ===== RAG Tools =====
 
-@mcp.tool(name="search_documents", description="IMPORTANT: Use this tool to search and retrieve information from uploaded documents (PDFs, text files, etc). Always use this tool when the user asks questions about document content, reports, uploaded files, or any information that might be in uploaded documents. Returns relevant text excerpts from the documents.")
-def search_documents(query: str) -> str:
-    result = query_documents(query)
+@mcp.tool(name="search_documents", description="IMPORTANT: Use this tool to search and retrieve information from uploaded documents (PDFs, text files, etc). Always use this tool when the user asks questions about document content, reports, uploaded files, or any information that might be in uploaded documents. Returns relevant text excerpts from the documents. Optional filters narrow the search when the user scopes the question: source (part of a file name, e.g. 'user guide'), file_type (e.g. 'pdf'), uploaded_by (uploader email), date_from / date_to (upload date, YYYY-MM-DD).")
+def search_documents(query: str, source: Optional[str] = None, file_type: Optional[str] = None,
+                     uploaded_by: Optional[str] = None, date_from: Optional[str] = None,
+                     date_to: Optional[str] = None) -> str:
+    filters = {
+        "source": source,
+        "file_type": file_type,
+        "uploaded_by": uploaded_by,
+        "date_from": date_from,
+        "date_to": date_to,
+    }
+    result = query_documents(query, filters={key: value for key, value in filters.items() if value})
     if "No relevant documents found" in result:
         return result
     return f"Here is the relevant information from the uploaded documents:\n\n{result}\n\nPlease use this information to answer the user's question accurately."
@@ -493,6 +503,14 @@ def list_uploaded_documents() -> List[dict]:
     return docs
 
 
+@mcp.tool(name="delete_uploaded_document", description="Remove a single uploaded document from the RAG system by its id (from list_uploaded_documents). Requires admin access.")
+def delete_uploaded_document(file_id: int) -> dict:
+    access_error = check_access(3)  # Admin required
+    if access_error:
+        return access_error
+    return delete_document(file_id)
+
+
 @mcp.tool(name="clear_uploaded_documents", description="Clear all uploaded documents from the RAG system (requires admin access)")
 def clear_uploaded_documents() -> dict:
     access_error = check_access(3)  # Admin required
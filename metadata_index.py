@@ -0,0 +1,257 @@
+"""Metadata Index - Row-id lists per metadata value for pre-filtered search.
+
+Each indexed field stores the value of every row as a small integer code. On
+load the codes are grouped into sorted row-id lists per value, so a filter
+resolves to its candidate rows without reading chunk files and search scores
+only those rows. After an update only the appended rows' codes are read and
+added to the lists, so refreshing after an ingest costs that ingest's rows.
+Files live next to the store they index:
+    metadata.json              rows indexed, the distinct values of each field and
+                               an id that changes when the index is rebuilt
+    metadata/<field>.i32       value code of each row, -1 if missing (append-only)
+    metadata/uploaded_on.i32   upload date of each row as a date ordinal, 0 if unknown
+"""
+
+import json
+import uuid
+from datetime import date, datetime
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from vector_store import _append_array, _file_lock, _remove_paths, _stat_fingerprint, _write_json_atomic
+
+METADATA_MANIFEST_FILE = "metadata.json"
+METADATA_DIR = "metadata"
+METADATA_LOCK_FILE = ".metadata.lock"
+DATES_FIELD = "uploaded_on"
+
+FIELDS = ("source", "file_type", "uploaded_by", "file_id")
+FILTER_KEYS = FIELDS + ("date_from", "date_to")
+UPDATE_BATCH_ROWS = 65536
+
+
+def row_values(metadata: dict) -> dict:
+    """Indexed field values of one chunk's metadata (strings, or None when absent)."""
+    source = metadata.get("source")
+    file_type = metadata.get("file_type") or (Path(source).suffix.lower() if source else None)
+    values = {
+        "source": source,
+        "file_type": file_type or None,
+        "uploaded_by": metadata.get("uploaded_by"),
+        "file_id": metadata.get("file_id"),
+    }
+    return {field: None if value is None else str(value) for field, value in values.items()}
+
+
+def row_date(metadata: dict) -> int:
+    """Upload date of a chunk as a date ordinal (0 when unknown)."""
+    uploaded_at = metadata.get("uploaded_at")
+    if not uploaded_at:
+        return 0
+    try:
+        return datetime.fromisoformat(uploaded_at).date().toordinal()
+    except ValueError:
+        return 0
+
+
+def _parse_date(value) -> int:
+    if isinstance(value, date):
+        return value.toordinal()
+    return datetime.fromisoformat(str(value)).date().toordinal()
+
+
+def _normalize_filter(field: str, wanted) -> list:
+    wanted = [wanted] if isinstance(wanted, (str, int)) else list(wanted)
+    wanted = [str(value).strip().lower() for value in wanted if str(value).strip()]
+    if field == "file_type":
+        wanted = [value if value.startswith(".") else f".{value}" for value in wanted]
+    return wanted
+
+
+def _value_matches(field: str, value: Optional[str], wanted: list) -> bool:
+    """Sources match on a case-insensitive substring ("user guide" finds "User_Guide.pdf")."""
+    if value is None:
+        return False
+    value = value.lower()
+    if field == "source":
+        return any(w in value or w.replace(" ", "_") in value for w in wanted)
+    return value in wanted
+
+
+class MetadataIndex:
+    """Per-value row-id lists over a VectorStore's chunk metadata."""
+
+    def __init__(self, store):
+        self.store = store
+        # (count, values per field, row-id lists per field, dates), swapped as one
+        self._view = (0, {}, {}, np.empty(0, dtype=np.int32))
+        self._index_id = None
+        self._fingerprint = None
+
+    @property
+    def path(self):
+        return self.store.path
+
+    @property
+    def count(self) -> int:
+        return self._view[0]
+
+    def _read_manifest(self) -> dict:
+        manifest_path = self.path / METADATA_MANIFEST_FILE
+        if not manifest_path.exists():
+            return {"count": 0, "values": {field: [] for field in FIELDS}}
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def refresh(self):
+        """Load codes appended since the last refresh into the row-id lists, or regroup all rows after a rebuild."""
+        fingerprint = _stat_fingerprint(self.path / METADATA_MANIFEST_FILE)
+        if fingerprint == self._fingerprint:
+            return
+        self._fingerprint = fingerprint
+
+        manifest = self._read_manifest()
+        count = manifest["count"]
+        values = manifest["values"]
+        if not count:
+            self._view = (0, {}, {}, np.empty(0, dtype=np.int32))
+            self._index_id = None
+            return
+
+        loaded, loaded_values, loaded_lists, loaded_dates = self._view
+        # Codes are append-only and values are only ever added, until the index is rebuilt
+        extends = (0 < loaded <= count and manifest.get("index_id") == self._index_id
+                   and all(values[field][:len(loaded_values[field])] == loaded_values[field] for field in FIELDS))
+        start = loaded if extends else 0
+
+        lists = {}
+        for field in FIELDS:
+            field_lists = list(loaded_lists[field]) if extends else []
+            field_lists += [np.empty(0, dtype=np.int64)] * (len(values[field]) - len(field_lists))
+            codes = np.fromfile(self.path / METADATA_DIR / f"{field}.i32", dtype=np.int32,
+                                count=count - start, offset=start * 4)
+            order = np.argsort(codes, kind="stable")
+            present, bounds = np.unique(codes[order], return_index=True)
+            bounds = np.append(bounds, len(order))
+            for i, code in enumerate(present.tolist()):
+                if code >= 0:
+                    # New row ids are larger than every listed one, so lists stay sorted
+                    field_lists[code] = np.concatenate([field_lists[code], order[bounds[i]:bounds[i + 1]] + start])
+            lists[field] = field_lists
+        dates = np.fromfile(self.path / METADATA_DIR / f"{DATES_FIELD}.i32", dtype=np.int32,
+                            count=count - start, offset=start * 4)
+        if extends:
+            dates = np.concatenate([loaded_dates, dates])
+        self._index_id = manifest.get("index_id")
+        self._view = (count, values, lists, dates)
+
+    # ---------- Building ----------
+
+    def update(self) -> dict:
+        """Index the metadata of rows appended to the store since the last update."""
+        self.store.refresh()
+        self.path.mkdir(parents=True, exist_ok=True)
+        with _file_lock(self.path / METADATA_LOCK_FILE):
+            manifest = self._read_manifest()
+            total = len(self.store)
+            if manifest["count"] > total:
+                # Codes for rows the store no longer has: reindex from scratch
+                self._remove_files()
+                manifest = self._read_manifest()
+
+            start = manifest["count"]
+            while manifest["count"] < total:
+                manifest = self._append(manifest, manifest["count"], min(manifest["count"] + UPDATE_BATCH_ROWS, total))
+        self.refresh()
+        return {"status": "current" if start == total else "indexed", "rows": total, "added": total - start}
+
+    def _append(self, manifest: dict, start: int, stop: int) -> dict:
+        values = {field: list(manifest["values"][field]) for field in FIELDS}
+        lookup = {field: {value: code for code, value in enumerate(values[field])} for field in FIELDS}
+        codes = {field: np.full(stop - start, -1, dtype=np.int32) for field in FIELDS}
+        dates = np.zeros(stop - start, dtype=np.int32)
+
+        stored = self.store.stored_rows(start, stop).tolist()
+        for row, (_, metadata) in zip(stored, self.store.get_chunks(stored)):
+            for field, value in row_values(metadata).items():
+                if value is None:
+                    continue
+                if value not in lookup[field]:
+                    lookup[field][value] = len(values[field])
+                    values[field].append(value)
+                codes[field][row - start] = lookup[field][value]
+            dates[row - start] = row_date(metadata)
+
+        (self.path / METADATA_DIR).mkdir(parents=True, exist_ok=True)
+        for name, array in list(codes.items()) + [(DATES_FIELD, dates)]:
+            _append_array(self.path / METADATA_DIR / f"{name}.i32", array, start)
+
+        manifest = {"count": stop, "values": values, "index_id": manifest.get("index_id") or uuid.uuid4().hex}
+        _write_json_atomic(self.path / METADATA_MANIFEST_FILE, manifest)
+        return manifest
+
+    def _remove_files(self):
+        _remove_paths(self.path / METADATA_MANIFEST_FILE, self.path / METADATA_DIR)
+
+    def clear(self):
+        """Forget every row's codes; the next update() reindexes the store."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        with _file_lock(self.path / METADATA_LOCK_FILE):
+            self._remove_files()
+        self.refresh()
+
+    # ---------- Filtering ----------
+
+    def matching_rows(self, filters: Optional[dict]) -> Optional[np.ndarray]:
+        """Sorted row ids matching every filter, or None when there is nothing to filter on.
+
+        filters keys: source, file_type, uploaded_by, file_id (a value or a
+        list of values) and date_from / date_to (ISO dates, inclusive).
+        """
+        filters = {key: value for key, value in (filters or {}).items() if value not in (None, "", [])}
+        if not filters:
+            return None
+        unknown = set(filters) - set(FILTER_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown filter(s): {', '.join(sorted(unknown))}. Use: {', '.join(FILTER_KEYS)}")
+
+        self.refresh()
+        count, values, lists, dates = self._view
+        wanted = {field: _normalize_filter(field, filters[field]) for field in FIELDS if field in filters}
+        date_from = _parse_date(filters["date_from"]) if "date_from" in filters else None
+        date_to = _parse_date(filters["date_to"]) if "date_to" in filters else None
+
+        rows = None
+        for field, field_wanted in wanted.items():
+            matches = [lists[field][code] for code, value in enumerate(values.get(field, []))
+                       if _value_matches(field, value, field_wanted)]
+            field_rows = np.sort(np.concatenate(matches)) if matches else np.empty(0, dtype=np.int64)
+            rows = field_rows if rows is None else np.intersect1d(rows, field_rows, assume_unique=True)
+        if date_from is not None or date_to is not None:
+            mask = dates > 0
+            if date_from is not None:
+                mask &= dates >= date_from
+            if date_to is not None:
+                mask &= dates <= date_to
+            date_rows = np.flatnonzero(mask)
+            rows = date_rows if rows is None else np.intersect1d(rows, date_rows, assume_unique=True)
+
+        # Rows appended since the last update are checked directly
+        tail = self.store.stored_rows(count, len(self.store)).tolist()
+        if tail:
+            extra = [row for row, (_, metadata) in zip(tail, self.store.get_chunks(tail))
+                     if self._row_matches(metadata, wanted, date_from, date_to)]
+            rows = np.concatenate([rows, np.asarray(extra, dtype=np.int64)])
+        return rows.astype(np.int64)
+
+    @staticmethod
+    def _row_matches(metadata: dict, wanted: dict, date_from: Optional[int], date_to: Optional[int]) -> bool:
+        current = row_values(metadata)
+        if not all(_value_matches(field, current[field], field_wanted) for field, field_wanted in wanted.items()):
+            return False
+        if date_from is None and date_to is None:
+            return True
+        day = row_date(metadata)
+        return day > 0 and (date_from is None or day >= date_from) and (date_to is None or day <= date_to)
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from typing import Optional, List
 from datetime import datetime
 
@@ -52,19 +53,47 @@ class UploadedFile(SQLModel, table=True):
     uploaded_by: Optional[int] = Field(default=None, foreign_key="employee.id")
     uploaded_at: datetime = Field(default_factory=datetime.now)
     is_active: bool = True
+    content_hash: Optional[str] = Field(default=None, index=True)  # sha256 of the file bytes
+    row_ranges: Optional[str] = None  # JSON [[start, stop], ...] of this file's vector store row ids
+
+
+class IngestClaim(SQLModel, table=True):
+    """Content hash of a file being ingested; the primary key lets one copy of the same bytes in at a time."""
+    content_hash: str = Field(primary_key=True)
+    file_path: str
+    claimed_at: datetime = Field(default_factory=datetime.now)
+
+
+class EmbeddingCache(SQLModel, table=True):
+    """Embeddings keyed by sha256(model name + chunk text), so identical chunks are embedded once."""
+    key: str = Field(primary_key=True)
+    model: str
+    vector: bytes  # float32 little-endian
+    created_at: datetime = Field(default_factory=datetime.now)
 
 
 class ChatSession(SQLModel, table=True):
     """Tracks chat sessions for history."""
+    # Sidebar: a user's active sessions, newest first
+    __table_args__ = (Index("ix_chatsession_user_active_created", "user_id", "is_active", "created_at"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: Optional[int] = Field(default=None, foreign_key="employee.id")
     preview: str = ""  # First user message as preview
     created_at: datetime = Field(default_factory=datetime.now)
     is_active: bool = True
+    summary: Optional[str] = None  # Rolling summary of the turns that fell out of the history window
+    summary_until: Optional[int] = None  # Id of the last Conversation folded into the summary
 
 
 class Conversation(SQLModel, table=True):
     """Tracks chat conversations."""
+    # History windows read the newest messages of a session (optionally of one user)
+    __table_args__ = (
+        Index("ix_conversation_session_created", "session_id", "created_at"),
+        Index("ix_conversation_user_session_created", "user_id", "session_id", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     session_id: Optional[int] = Field(default=None, foreign_key="chatsession.id")
     user_id: Optional[int] = Field(default=None, foreign_key="employee.id")
@@ -0,0 +1,121 @@
+"""ONNX Embeddings - Quantized CPU runtime for the sentence-transformers model.
+
+Runs an int8 ONNX export of all-MiniLM-L6-v2 with onnxruntime and the
+`tokenizers` library, so searching and ingesting never import PyTorch.
+Export the model once (needs torch, transformers and onnxruntime):
+    python onnx_embeddings.py --output models/all-MiniLM-L6-v2-onnx
+which writes model.onnx, model_int8.onnx and tokenizer.json. Pooling and
+normalization match the sentence-transformers pipeline (token mean, then L2).
+"""
+
+import argparse
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+MAX_SEQ_LENGTH = 256    # all-MiniLM-L6-v2 truncates inputs to 256 word pieces
+BATCH_SIZE = 32
+INPUT_NAMES = ["input_ids", "attention_mask", "token_type_ids"]
+
+
+class OnnxEmbeddings:
+    """Drop-in replacement for HuggingFaceEmbeddings (embed_documents / embed_query)."""
+
+    def __init__(self, model_dir, model_file: str = "model_int8.onnx", threads: int = 0,
+                 batch_size: int = BATCH_SIZE):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        model_path = model_dir / model_file
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"{model_path} not found; export it with: python onnx_embeddings.py --output {model_dir}")
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        pad_id = self.tokenizer.token_to_id("[PAD]") or 0
+        self.tokenizer.enable_padding(pad_id=pad_id, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        self.batch_size = batch_size
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+
+        hidden = self.session.run(None, feeds)[0]  # (batch, tokens, dim)
+        weights = mask[..., None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Batch texts of similar length together so little time goes into padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        vectors: List[List[float]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._embed_batch([texts[i] for i in batch])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def export_model(model_name: str, output_dir: Path) -> dict:
+    """Export a Hugging Face encoder to ONNX and write an int8 dynamically quantized copy."""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    tokenizer.save_pretrained(str(output_dir))  # writes tokenizer.json (fast tokenizer)
+    model = AutoModel.from_pretrained(model_name)
+    model.config.return_dict = False
+    model.eval()
+
+    sample = tokenizer(["An example sentence to trace the graph."], return_tensors="pt")
+    dynamic_axes = {name: {0: "batch", 1: "tokens"} for name in INPUT_NAMES + ["last_hidden_state"]}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in INPUT_NAMES),
+            str(output_dir / "model.onnx"),
+            input_names=INPUT_NAMES,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    quantize_dynamic(str(output_dir / "model.onnx"), str(output_dir / "model_int8.onnx"),
+                     weight_type=QuantType.QInt8)
+    return {
+        "status": "exported",
+        "model": model_name,
+        "files": sorted(path.name for path in output_dir.iterdir()),
+    }
+
+
+def main():
+    from config import EMBEDDING_ONNX_DIR
+
+    parser = argparse.ArgumentParser(description="Export the embedding model to (int8) ONNX.")
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--output", type=Path, default=Path(EMBEDDING_ONNX_DIR))
+    args = parser.parse_args()
+    print(export_model(args.model, args.output))
+
+
+if __name__ == "__main__":
+    main()
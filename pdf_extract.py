@@ -0,0 +1,79 @@
+"""PDF Extract - Per-page PDF text extraction, fanned out over a process pool.
+
+Workers are started with the spawn method on every platform: forking the
+server would copy its threads and held locks into the children. The module is
+kept free of heavy imports so spawned workers, which re-import it, start quickly.
+"""
+
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
+
+from pypdf import PdfReader
+
+PARALLEL_MIN_PAGES = 32   # Smaller PDFs are parsed inline; pool startup would dominate
+PAGES_PER_TASK = 8
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()  # Ingest workers may start the first large PDF together
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def shutdown_pdf_workers():
+    """Stop the worker processes, if started (application shutdown)."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """Worker: extract pages [start, stop) of a PDF."""
+    reader = PdfReader(file_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def iter_pdf_pages(file_path: str) -> Iterator[Tuple[int, int, str]]:
+    """Yield (page_number, page_count, text) in page order, page numbers starting at 1.
+
+    Large PDFs are split into page ranges parsed in parallel worker processes;
+    results still arrive in order as soon as each range is done, and only a
+    few ranges are parsed ahead of the consumer.
+    """
+    reader = PdfReader(file_path)
+    page_count = len(reader.pages)
+
+    if page_count < PARALLEL_MIN_PAGES or (os.cpu_count() or 1) < 2:
+        for i, page in enumerate(reader.pages):
+            yield i + 1, page_count, page.extract_text() or ""
+        return
+
+    # Keep a bounded window of ranges in flight so a slow consumer (embedding)
+    # never makes finished page texts pile up in memory
+    executor = _get_executor()
+
+    def submit(start: int):
+        return start, executor.submit(_extract_page_range, file_path, start, min(start + PAGES_PER_TASK, page_count))
+
+    starts = iter(range(0, page_count, PAGES_PER_TASK))
+    pending = deque(submit(start) for start in islice(starts, 2 * (os.cpu_count() or 1)))
+    while pending:
+        start, future = pending.popleft()
+        next_start = next(starts, None)
+        if next_start is not None:
+            pending.append(submit(next_start))
+        for offset, text in enumerate(future.result()):
+            yield start + offset + 1, page_count, text
@@ -1,74 +1,211 @@
 """RAG Manager - Document ingestion and retrieval for PDFs and other files."""
 
-import os
-import pickle
+import bisect
+import hashlib
+import json
+import threading
+from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
-from pypdf import PdfReader
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
 from langchain_core.documents import Document
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from sqlalchemy import insert, delete
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 from db import engine
-from models import UploadedFile
+from models import UploadedFile, EmbeddingCache, IngestClaim
+from config import (RAG_INDEX_MODE, RAG_IVF_NPROBE, RAG_VECTOR_COMPRESSION, RAG_SEARCH_THREADS,
+                    RAG_HYBRID_SEARCH, RAG_CONTEXT_TOKENS, INGEST_EMBED_BATCH, RAG_QUERY_CACHE_SIZE,
+                    RAG_RESULT_CACHE_SIZE, EMBEDDING_BACKEND, EMBEDDING_ONNX_DIR, EMBEDDING_ONNX_FILE,
+                    EMBEDDING_THREADS)
+from vector_store import VectorStore, migrate_from_pickle
+from ann_index import IVFIndex
+from bm25_index import BM25Index
+from metadata_index import MetadataIndex
+from lru_cache import LRUCache
+from pdf_extract import iter_pdf_pages
+from context_assembler import assemble_context
+from stream_splitter import StreamSplitter
 
 # Directory to store uploaded documents and vector store
 UPLOAD_DIR = Path("uploads")
-VECTOR_STORE_PATH = Path("vector_store.pkl")
+VECTOR_STORE_DIR = Path("vector_store")
+LEGACY_VECTOR_STORE_PATH = Path("vector_store.pkl")
 UPLOAD_DIR.mkdir(exist_ok=True)
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# Quantized vectors differ slightly, so each runtime keeps its own embedding cache entries
+EMBEDDING_CACHE_NAME = (f"{EMBEDDING_MODEL_NAME}:{EMBEDDING_ONNX_FILE}" if EMBEDDING_BACKEND == "onnx"
+                        else EMBEDDING_MODEL_NAME)
+TEXT_EXTENSIONS = [".txt", ".md", ".csv", ".json", ".py", ".js", ".html", ".css"]
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+TEXT_READ_SIZE = 64 * 1024
+RRF_K = 60                # Reciprocal rank fusion damping constant
+HYBRID_CANDIDATES = 20    # Minimum hits taken from each retriever before fusion
 
 # Initialize embeddings model (using a small, fast model)
 embeddings = None
-documents_store: List[Document] = []
-document_embeddings: List[List[float]] = []
+vector_store = VectorStore(VECTOR_STORE_DIR, compression=RAG_VECTOR_COMPRESSION,
+                           search_threads=RAG_SEARCH_THREADS)
+ann_index = IVFIndex(vector_store, nprobe=RAG_IVF_NPROBE)
+bm25_index = BM25Index(vector_store)
+metadata_index = MetadataIndex(vector_store)
+# Query embeddings depend only on the text; results also on the index version
+_query_embedding_cache = LRUCache(RAG_QUERY_CACHE_SIZE)
+_result_cache = LRUCache(RAG_RESULT_CACHE_SIZE)
+_compaction_thread: Optional[threading.Thread] = None
 
 
 def get_embeddings():
     """Lazy load embeddings model."""
     global embeddings
     if embeddings is None:
-        embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={"device": "cpu"}
-        )
+        if EMBEDDING_BACKEND == "onnx":
+            from onnx_embeddings import OnnxEmbeddings
+            embeddings = OnnxEmbeddings(EMBEDDING_ONNX_DIR, EMBEDDING_ONNX_FILE, threads=EMBEDDING_THREADS)
+        else:
+            # Imported here so the ONNX backend never loads PyTorch
+            from langchain_huggingface import HuggingFaceEmbeddings
+            embeddings = HuggingFaceEmbeddings(
+                model_name=EMBEDDING_MODEL_NAME,
+                model_kwargs={"device": "cpu"}
+            )
     return embeddings
 
 
+def _chunk_cache_key(text: str) -> str:
+    return hashlib.sha256(f"{EMBEDDING_CACHE_NAME}\0{text}".encode("utf-8")).hexdigest()
+
+
+def embed_chunks(texts: List[str]) -> Tuple[np.ndarray, int]:
+    """Embed chunk texts, reusing cached vectors for any text seen before.
+    
+    Returns the (len(texts) x dim) matrix and how many chunks were newly embedded.
+    """
+    keys = [_chunk_cache_key(text) for text in texts]
+    unique_keys = list(dict.fromkeys(keys))
+    vectors = {}
+    
+    with Session(engine) as session:
+        # Stay well under SQLite's bound-parameter limit
+        for i in range(0, len(unique_keys), 500):
+            statement = select(EmbeddingCache).where(EmbeddingCache.key.in_(unique_keys[i:i + 500]))
+            for row in session.exec(statement):
+                vectors[row.key] = np.frombuffer(row.vector, dtype=np.float32)
+        
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        
+        if missing:
+            new_vectors = get_embeddings().embed_documents(list(missing.values()))
+            now = datetime.now()
+            rows = []
+            for key, vector in zip(missing, new_vectors):
+                vectors[key] = np.asarray(vector, dtype=np.float32)
+                rows.append({"key": key, "model": EMBEDDING_CACHE_NAME, "vector": vectors[key].tobytes(), "created_at": now})
+            # One executemany; a concurrent ingest may have cached the same chunk meanwhile
+            session.execute(insert(EmbeddingCache).prefix_with("OR IGNORE"), rows)
+            session.commit()
+    
+    return np.stack([vectors[key] for key in keys]), len(missing)
+
+
+def file_sha256(file_path: str) -> str:
+    """Hash a file's bytes without reading it into memory at once."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
 def load_vector_store():
-    """Load existing vector store from disk."""
-    global documents_store, document_embeddings
-    if VECTOR_STORE_PATH.exists():
-        with open(VECTOR_STORE_PATH, "rb") as f:
-            data = pickle.load(f)
-            documents_store = data.get("documents", [])
-            document_embeddings = data.get("embeddings", [])
+    """Bring the cached vector store up to date with disk.
+
+    Cheap when nothing changed: the store only remaps when another process
+    committed a new generation. Migrates the legacy pickle once if needed.
+    """
+    if vector_store.generation is None and not vector_store.exists() and LEGACY_VECTOR_STORE_PATH.exists():
+        print(f"[RAG] Migrating {LEGACY_VECTOR_STORE_PATH} to {VECTOR_STORE_DIR}/")
+        print(f"[RAG] {migrate_from_pickle(LEGACY_VECTOR_STORE_PATH, VECTOR_STORE_DIR)}")
+    vector_store.refresh()
+
+
+def get_vector_store_stats() -> dict:
+    """Cache counters for the in-process vector store."""
+    return {
+        "generation": vector_store.generation,
+        "chunks": vector_store.live_count,
+        "deleted_chunks": len(vector_store.deleted),
+        "cache_hits": vector_store.stats["hits"],
+        "reloads": vector_store.stats["reloads"],
+        "index_mode": RAG_INDEX_MODE,
+        "compression": vector_store.compression or "none",
+        "search_threads": vector_store.search_threads,
+        "ann_indexed": ann_index.count,
+        "hybrid_search": RAG_HYBRID_SEARCH,
+        "bm25_indexed": bm25_index.count,
+        "metadata_indexed": metadata_index.count,
+        "query_embedding_cache": _query_embedding_cache.stats(),
+        "result_cache": _result_cache.stats()
+    }
 
 
-def save_vector_store():
-    """Save vector store to disk."""
-    with open(VECTOR_STORE_PATH, "wb") as f:
-        pickle.dump({
-            "documents": documents_store,
-            "embeddings": document_embeddings
-        }, f)
+def compact_vector_store() -> dict:
+    """Merge small store segments (safe to run while ingesting and searching)."""
+    result = vector_store.compact()
+    print(f"[RAG] Compaction: {result}")
+    return result
 
 
-def extract_text_from_pdf(file_path: str) -> str:
+def _schedule_compaction():
+    """Start a background compaction if small segments have piled up."""
+    global _compaction_thread
+    if not vector_store.needs_compaction():
+        return
+    if _compaction_thread is not None and _compaction_thread.is_alive():
+        return
+    _compaction_thread = threading.Thread(target=compact_vector_store, daemon=True)
+    _compaction_thread.start()
+
+
+def _search_store(query_embeddings, k: int, exact: bool = False, allowed_rows=None):
+    """Route a batch of query vectors to the configured index (exact is the fallback).
+    
+    allowed_rows (from a metadata filter) restricts scoring to just those rows.
+    """
+    if allowed_rows is not None:
+        return vector_store.search_rows(query_embeddings, allowed_rows, k)
+    if RAG_INDEX_MODE == "ivf" and not exact:
+        return ann_index.search_batch(query_embeddings, k)
+    return vector_store.search_batch(query_embeddings, k)
+
+
+def extract_pdf_pages(file_path: str, on_progress: Optional[Callable] = None) -> List[str]:
+    """Extract the text of each PDF page, in order (parallel for large PDFs)."""
+    pages = []
+    for page_number, page_count, text in iter_pdf_pages(file_path):
+        pages.append(text)
+        if on_progress:
+            on_progress(pages_parsed=page_number, pages_total=page_count)
+    return pages
+
+
+def extract_text_from_pdf(file_path: str, on_progress: Optional[Callable] = None) -> str:
     """Extract text content from a PDF file."""
-    reader = PdfReader(file_path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() or ""
-    return text
+    return "\n".join(extract_pdf_pages(file_path, on_progress))
 
 
-def extract_text_from_file(file_path: str) -> str:
+def extract_text_from_file(file_path: str, on_progress: Optional[Callable] = None) -> str:
     """Extract text from various file types."""
     ext = Path(file_path).suffix.lower()
     
     if ext == ".pdf":
-        return extract_text_from_pdf(file_path)
-    elif ext in [".txt", ".md", ".csv", ".json", ".py", ".js", ".html", ".css"]:
+        return extract_text_from_pdf(file_path, on_progress)
+    elif ext in TEXT_EXTENSIONS:
         with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
             return f.read()
     elif ext in [".doc", ".docx"]:
@@ -82,119 +219,456 @@ def extract_text_from_file(file_path: str) -> str:
         return f"Unsupported file type: {ext}"
 
 
-def ingest_document(file_path: str, metadata: Optional[dict] = None, uploaded_by: Optional[int] = None) -> dict:
-    """Ingest a document into the RAG system and save to database."""
-    global documents_store, document_embeddings
+def iter_document_text(file_path: str, on_progress: Optional[Callable] = None) -> Iterator[Tuple[str, Optional[int]]]:
+    """Yield (text, page_number) pieces of a document in order without loading it whole.
+
+    page_number is set on the first piece of each PDF page and None otherwise.
+    """
+    ext = Path(file_path).suffix.lower()
+    
+    if ext == ".pdf":
+        for page_number, page_count, text in iter_pdf_pages(file_path):
+            if on_progress:
+                on_progress(pages_parsed=page_number, pages_total=page_count)
+            yield (text + "\n" if page_number < page_count else text), page_number
+    elif ext in TEXT_EXTENSIONS:
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            for block in iter(lambda: f.read(TEXT_READ_SIZE), ""):
+                yield block, None
+    else:
+        yield extract_text_from_file(file_path, on_progress), None
+
+
+def iter_document_chunks(pieces: Iterable[Tuple[str, Optional[int]]]) -> Iterator[Tuple[str, int, Optional[int], Optional[int]]]:
+    """Split streamed text into (chunk, start, page_start, page_end) with bounded buffering.
+
+    start is the chunk's character offset in the document text. Chunks are
+    the ones RecursiveCharacterTextSplitter gives for the whole document.
+    """
+    splitter = StreamSplitter(CHUNK_SIZE, CHUNK_OVERLAP)
+    text_length = 0
+    page_offsets = []   # Document offset where each PDF page starts
     
+    def emit(chunks):
+        for chunk, start in chunks:
+            page_start = page_end = None
+            if page_offsets:
+                end = start + max(len(chunk) - 1, 0)
+                page_start = bisect.bisect_right(page_offsets, start)
+                page_end = bisect.bisect_right(page_offsets, end)
+            yield chunk, start, page_start, page_end
+    
+    for text, page_number in pieces:
+        if page_number is not None:
+            page_offsets.append(text_length)
+        text_length += len(text)
+        yield from emit(splitter.feed(text))
+    
+    yield from emit(splitter.finish())
+
+
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _claim_content(content_hash: str, file_path: str) -> Optional[str]:
+    """Reserve a content hash for one ingest.
+
+    Returns None once claimed, or the path of the file that already holds
+    the hash (being ingested or indexed).
+    """
+    while True:
+        try:
+            with Session(engine) as session:
+                session.add(IngestClaim(content_hash=content_hash, file_path=file_path))
+                session.commit()
+        except IntegrityError:
+            with Session(engine) as session:
+                claim = session.get(IngestClaim, content_hash)
+            if claim:
+                return claim.file_path
+            continue  # Released meanwhile: try again
+        
+        # Claims only cover ingests in progress; finished files are active rows
+        with Session(engine) as session:
+            existing = session.exec(
+                select(UploadedFile)
+                .where(UploadedFile.content_hash == content_hash)
+                .where(UploadedFile.is_active == True)
+            ).first()
+        if not existing:
+            return None
+        _release_claim(content_hash)
+        return existing.file_path
+
+
+def _release_claim(content_hash: str):
+    with Session(engine) as session:
+        session.exec(delete(IngestClaim).where(IngestClaim.content_hash == content_hash))
+        session.commit()
+
+
+def clear_ingest_claims():
+    """Drop claims left by ingests that never finished (the process stopped mid-ingest)."""
+    with Session(engine) as session:
+        session.exec(delete(IngestClaim))
+        session.commit()
+
+
+def ingest_document(file_path: str, metadata: Optional[dict] = None, uploaded_by: Optional[int] = None,
+                    on_progress: Optional[Callable] = None, content_hash: Optional[str] = None,
+                    remove_duplicate: bool = False) -> dict:
+    """Ingest a document into the RAG system and save to database.
+    
+    on_progress, if given, is called with keyword counters (pages_parsed,
+    pages_total, chunks_total, chunks_embedded) as work completes.
+    content_hash skips re-hashing when the upload path already computed it.
+    remove_duplicate deletes the file when its bytes are already indexed
+    (uploads saved under a new name).
+    """
+    def report(**progress):
+        if on_progress:
+            on_progress(**progress)
+    
+    uploaded_file_id = None
+    row_ranges = []
+    claimed = False
     try:
         path = Path(file_path)
+        file_name = path.name
         
-        # Extract text
-        text = extract_text_from_file(file_path)
-        if not text.strip():
-            return {"error": "No text content found in document"}
+        # Skip re-uploads of bytes that are already indexed or being ingested
+        content_hash = content_hash or file_sha256(file_path)
+        duplicate_path = _claim_content(content_hash, str(path.absolute()))
+        if duplicate_path is not None:
+            if remove_duplicate and Path(duplicate_path) != path.absolute():
+                path.unlink(missing_ok=True)
+            return {
+                "status": "duplicate",
+                "file": file_name,
+                "duplicate_of": Path(duplicate_path).name,
+                "chunks_created": 0,
+                "total_documents": vector_store.live_count
+            }
+        claimed = True
         
-        # Split into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len
+        # Register the file first (inactive until done) so chunks can carry its id
+        uploaded_file = UploadedFile(
+            filename=file_name,
+            file_path=str(path.absolute()),
+            file_size=path.stat().st_size if path.exists() else 0,
+            file_type=path.suffix.lower(),
+            uploaded_by=uploaded_by,
+            content_hash=content_hash,
+            is_active=False
         )
-        chunks = text_splitter.split_text(text)
+        with Session(engine) as session:
+            session.add(uploaded_file)
+            session.commit()
+            uploaded_file_id = uploaded_file.id
         
-        # Create documents with metadata
-        file_name = path.name
-        base_metadata = {"source": file_name, "file_path": file_path}
+        base_metadata = {
+            "source": file_name,
+            "file_path": file_path,
+            "file_id": uploaded_file_id,
+            "uploaded_at": datetime.now().isoformat(timespec="seconds")
+        }
         if metadata:
             base_metadata.update(metadata)
         
-        docs = [
-            Document(page_content=chunk, metadata={**base_metadata, "chunk": i})
-            for i, chunk in enumerate(chunks)
-        ]
-        
-        # Generate embeddings
-        emb_model = get_embeddings()
-        new_embeddings = emb_model.embed_documents([doc.page_content for doc in docs])
-        
-        # Add to store
-        documents_store.extend(docs)
-        document_embeddings.extend(new_embeddings)
+        # Stream extract -> split -> embed -> append, INGEST_EMBED_BATCH chunks at a
+        # time: memory stays flat and early chunks are searchable before the end
+        chunk_stream = iter_document_chunks(iter_document_text(file_path, report))
+        chunks_created = 0
+        embedded_count = 0
+        for batch in _batched(chunk_stream, INGEST_EMBED_BATCH):
+            texts = [chunk for chunk, _, _, _ in batch]
+            metadatas = []
+            for i, (_, start, page_start, page_end) in enumerate(batch):
+                # start_index lets query_documents stitch overlapping hits back together
+                chunk_metadata = {**base_metadata, "chunk": chunks_created + i, "start_index": start}
+                if page_start:
+                    chunk_metadata["page_start"] = page_start
+                    chunk_metadata["page_end"] = page_end
+                metadatas.append(chunk_metadata)
+            
+            # Chunks seen before come from the embedding cache
+            batch_embeddings, newly_embedded = embed_chunks(texts)
+            rows = vector_store.add(texts, metadatas, batch_embeddings)
+            # Concurrent ingests interleave, so a file owns a list of row ranges
+            if row_ranges and row_ranges[-1][1] == rows.start:
+                row_ranges[-1][1] = rows.stop
+            else:
+                row_ranges.append([rows.start, rows.stop])
+            chunks_created += len(batch)
+            embedded_count += newly_embedded
+            report(chunks_embedded=chunks_created)
+            _schedule_compaction()
         
-        # Save to disk
-        save_vector_store()
+        if not chunks_created:
+            _discard_ingest(uploaded_file_id, row_ranges)
+            return {"error": "No text content found in document"}
+        report(chunks_total=chunks_created)
+        metadata_index.update()
+        if RAG_INDEX_MODE == "ivf":
+            ann_index.update()
+        if RAG_HYBRID_SEARCH:
+            bm25_index.update()
         
-        # Save to database
-        file_size = path.stat().st_size if path.exists() else 0
-        uploaded_file = UploadedFile(
-            filename=file_name,
-            file_path=str(path.absolute()),
-            file_size=file_size,
-            file_type=path.suffix.lower(),
-            chunks_count=len(chunks),
-            uploaded_by=uploaded_by
-        )
+        # Publish the file in the database
         with Session(engine) as session:
+            uploaded_file = session.get(UploadedFile, uploaded_file_id)
+            uploaded_file.chunks_count = chunks_created
+            uploaded_file.row_ranges = json.dumps(row_ranges)
+            uploaded_file.is_active = True
             session.add(uploaded_file)
             session.commit()
         
         return {
             "status": "success",
             "file": file_name,
-            "chunks_created": len(chunks),
-            "total_documents": len(documents_store)
+            "file_id": uploaded_file_id,
+            "chunks_created": chunks_created,
+            "chunks_embedded": embedded_count,
+            "total_documents": vector_store.live_count
         }
     except Exception as e:
+        try:
+            _discard_ingest(uploaded_file_id, row_ranges)
+        except Exception as cleanup_error:
+            print(f"[RAG] Could not roll back partial ingest: {cleanup_error}")
         return {"error": str(e)}
+    finally:
+        if claimed:
+            # Published (the active row now guards the hash) or rolled back
+            _release_claim(content_hash)
+
+
+def _discard_ingest(uploaded_file_id: Optional[int], row_ranges: List[List[int]]):
+    """Undo a failed ingest: tombstone the rows it appended and drop its file record."""
+    if row_ranges:
+        vector_store.delete(row for start, stop in row_ranges for row in range(start, stop))
+        _schedule_compaction()
+    if uploaded_file_id is not None:
+        with Session(engine) as session:
+            uploaded_file = session.get(UploadedFile, uploaded_file_id)
+            if uploaded_file:
+                session.delete(uploaded_file)
+                session.commit()
+
+
+def _file_rows(uploaded_file: UploadedFile) -> List[int]:
+    """Vector store row ids holding a file's chunks."""
+    if uploaded_file.row_ranges:
+        return [row for start, stop in json.loads(uploaded_file.row_ranges) for row in range(start, stop)]
+    # Files ingested before row ranges were recorded: match chunk metadata (full scan)
+    file_path = Path(uploaded_file.file_path)
+    return [
+        row for row, _, metadata in vector_store.iter_rows()
+        if metadata.get("file_id") == uploaded_file.id
+        or (metadata.get("file_id") is None and Path(metadata.get("file_path", "")).absolute() == file_path)
+    ]
 
 
-def similarity_search(query: str, k: int = 5) -> List[Document]:
-    """Search for similar documents using cosine similarity."""
-    # Always reload vector store to get latest documents
+def delete_document(file_id: int) -> dict:
+    """Remove one document from search immediately.
+    
+    Its rows are tombstoned (cost proportional to the file's chunks);
+    background compaction reclaims the space later.
+    """
     load_vector_store()
     
-    if not documents_store or not document_embeddings:
+    with Session(engine) as session:
+        uploaded_file = session.get(UploadedFile, file_id)
+        if not uploaded_file or not uploaded_file.is_active:
+            return {"error": f"Document {file_id} not found"}
+        
+        deleted = vector_store.delete(_file_rows(uploaded_file))
+        uploaded_file.is_active = False
+        session.add(uploaded_file)
+        session.commit()
+        file_name = uploaded_file.filename
+    
+    _schedule_compaction()
+    return {
+        "status": "deleted",
+        "file": file_name,
+        "chunks_deleted": deleted,
+        "total_documents": vector_store.live_count
+    }
+
+
+def _normalize_query(query: str) -> str:
+    # The embedding model and BM25 are both case-insensitive
+    return " ".join(query.lower().split())
+
+
+def embed_queries(queries: List[str]) -> List[np.ndarray]:
+    """Embed search queries, reusing cached vectors for text searched before."""
+    keys = [_normalize_query(query) for query in queries]
+    vectors = {}
+    missing = []
+    for key in dict.fromkeys(keys):
+        found, vector = _query_embedding_cache.get(key)
+        if found:
+            vectors[key] = vector
+        else:
+            missing.append(key)
+    
+    if missing:
+        for key, vector in zip(missing, get_embeddings().embed_documents(missing)):
+            vector = np.asarray(vector, dtype=np.float32)
+            vector.flags.writeable = False
+            _query_embedding_cache.put(key, vector)
+            vectors[key] = vector
+    return [vectors[key] for key in keys]
+
+
+def _result_key(kind: str, query: str, k: int, exact: bool, filters: Optional[dict]) -> tuple:
+    """Cache key for one search against the current on-disk index version.
+    
+    Any ingest, delete or index rebuild changes the version, so stale results
+    are never served; they simply age out of the LRU.
+    """
+    load_vector_store()
+    version = [vector_store.generation]
+    if RAG_INDEX_MODE == "ivf" and not exact:
+        ann_index.refresh()
+        version.append((ann_index.count, ann_index.trained_count))
+    if kind == "hybrid":
+        bm25_index.refresh()
+        version.append(bm25_index.count)
+    return (kind, _normalize_query(query), k, exact, json.dumps(filters or {}, sort_keys=True, default=str),
+            tuple(version))
+
+
+def similarity_search(query: str, k: int = 5, exact: bool = False, filters: Optional[dict] = None) -> List[Document]:
+    """Search for similar documents using cosine similarity.
+    
+    Uses the ANN index when RAG_INDEX_MODE is "ivf"; pass exact=True for ground truth.
+    filters (source, file_type, uploaded_by, file_id, date_from, date_to) limit
+    scoring to matching rows; an unknown filter raises ValueError.
+    """
+    # Pick up writes from other processes (no-op when the generation is unchanged)
+    key = _result_key("vector", query, k, exact, filters)
+    
+    if not vector_store.live_count:
+        return []
+    found, cached = _result_cache.get(key)
+    if found:
+        return list(cached)
+    allowed_rows = metadata_index.matching_rows(filters)
+    if allowed_rows is not None and not len(allowed_rows):
         return []
     
     try:
-        import numpy as np
-        
         # Get query embedding
-        emb_model = get_embeddings()
-        query_embedding = emb_model.embed_query(query)
+        query_embedding = embed_queries([query])[0]
         
-        # Calculate cosine similarities
-        query_np = np.array(query_embedding)
-        doc_embeddings_np = np.array(document_embeddings)
-        
-        # Normalize vectors
-        query_norm = query_np / np.linalg.norm(query_np)
-        doc_norms = doc_embeddings_np / np.linalg.norm(doc_embeddings_np, axis=1, keepdims=True)
-        
-        # Calculate similarities
-        similarities = np.dot(doc_norms, query_norm)
+        # Score against the memory-mapped matrix
+        hits = _search_store([query_embedding], k, exact, allowed_rows)[0]
+        documents = _hits_to_documents(hits)
+    except Exception as e:
+        print(f"Search error: {e}")
+        return []
+    _result_cache.put(key, documents)
+    return list(documents)
+
+
+def similarity_search_batch(queries: List[str], k: int = 5, exact: bool = False,
+                            filters: Optional[dict] = None) -> List[List[Document]]:
+    """Search many queries at once with a single matrix-matrix product."""
+    load_vector_store()
+    
+    if not queries or not vector_store.live_count:
+        return [[] for _ in queries]
+    allowed_rows = metadata_index.matching_rows(filters)
+    if allowed_rows is not None and not len(allowed_rows):
+        return [[] for _ in queries]
+    
+    try:
+        query_embeddings = embed_queries(list(queries))
         
-        # Get top k indices
-        top_indices = np.argsort(similarities)[-k:][::-1]
+        return [_hits_to_documents(hits) for hits in _search_store(query_embeddings, k, exact, allowed_rows)]
+    except Exception as e:
+        print(f"Batch search error: {e}")
+        return [[] for _ in queries]
+
+
+def hybrid_search(query: str, k: int = 5, exact: bool = False, filters: Optional[dict] = None) -> List[Document]:
+    """Fuse vector and BM25 keyword rankings with reciprocal rank fusion.
+    
+    Keyword hits rescue exact codes, naming rules and acronyms that the
+    embedding model blurs, so a small k is enough. filters work as in
+    similarity_search and apply to both rankings before scoring.
+    """
+    key = _result_key("hybrid", query, k, exact, filters)
+    
+    if not vector_store.live_count:
+        return []
+    found, cached = _result_cache.get(key)
+    if found:
+        return list(cached)
+    allowed_rows = metadata_index.matching_rows(filters)
+    if allowed_rows is not None and not len(allowed_rows):
+        return []
+    
+    try:
+        candidates = max(k, HYBRID_CANDIDATES)
+        query_embedding = embed_queries([query])[0]
+        dense = [(row, score) for row, score in _search_store([query_embedding], candidates, exact, allowed_rows)[0]
+                 if score > 0.1]
+        keyword = bm25_index.search(query, candidates, allowed_rows)
         
-        # Lower threshold to 0.1 for better recall
-        return [documents_store[i] for i in top_indices if similarities[i] > 0.1]
+        fused = {}
+        for hits in (dense, keyword):
+            for rank, (row, _) in enumerate(hits):
+                fused[row] = fused.get(row, 0.0) + 1.0 / (RRF_K + rank + 1)
+        rows = sorted(fused, key=fused.get, reverse=True)[:k]
+        documents = _rows_to_documents(rows)
     except Exception as e:
-        print(f"Search error: {e}")
+        print(f"Hybrid search error: {e}")
         return []
+    _result_cache.put(key, documents)
+    return list(documents)
+
+
+def _hits_to_documents(hits) -> List[Document]:
+    """Turn (row, score) hits into Documents, dropping weak matches."""
+    # Lower threshold to 0.1 for better recall
+    return _rows_to_documents([row for row, score in hits if score > 0.1])
+
 
+def _rows_to_documents(rows: List[int]) -> List[Document]:
+    return [
+        Document(page_content=text, metadata=metadata)
+        for text, metadata in vector_store.get_chunks(rows)
+    ]
 
-def query_documents(query: str, k: int = 5) -> str:
-    """Query the document store and return formatted results."""
-    print(f"[RAG] Searching for: {query}")
+
+def query_documents(query: str, k: int = 5, filters: Optional[dict] = None) -> str:
+    """Query the document store and return formatted results.
     
-    # Reload to ensure we have latest
-    load_vector_store()
-    print(f"[RAG] Vector store has {len(documents_store)} chunks")
+    filters narrow the search before scoring, e.g. {"source": "user guide"},
+    {"file_type": "pdf"} or {"date_from": "2024-01-01"}.
+    """
+    print(f"[RAG] Searching for: {query}" + (f" (filters: {filters})" if filters else ""))
     
-    results = similarity_search(query, k)
+    search = hybrid_search if RAG_HYBRID_SEARCH else similarity_search
+    try:
+        results = search(query, k, filters=filters)
+    except ValueError as e:
+        return f"Invalid search filter: {e}"
+    print(f"[RAG] Vector store has {vector_store.live_count} chunks (generation {vector_store.generation})")
     print(f"[RAG] Found {len(results)} relevant chunks")
     
+    if not results and filters:
+        return f"No relevant content found matching the filters {filters}. Try removing or relaxing a filter."
     if not results:
         # Check if any documents exist at all
         with Session(engine) as session:
@@ -204,18 +678,17 @@ def query_documents(query: str, k: int = 5) -> str:
                 return f"No relevant content found for your query. Available documents: {', '.join([f.filename for f in files])}. Try a different search term."
         return "No documents have been uploaded yet. Please upload documents first using the upload feature."
     
-    response = ""
-    for i, doc in enumerate(results, 1):
-        source = doc.metadata.get("source", "Unknown")
-        content = doc.page_content
-        response += f"[Source: {source}]\n{content}\n\n---\n\n"
+    # Overlapping hits from one file are stitched together and the total is capped
+    response, omitted = assemble_context(results, RAG_CONTEXT_TOKENS)
+    if omitted:
+        response += f"({omitted} less relevant passage(s) omitted to fit the context budget)\n"
     
     return response
 
 
 def list_ingested_documents() -> List[dict]:
     """List all ingested documents from the database."""
-    # Reload vector store to get current chunk count
+    # Refresh vector store to get current chunk count
     load_vector_store()
     
     with Session(engine) as session:
@@ -230,7 +703,7 @@ def list_ingested_documents() -> List[dict]:
                 "file_type": f.file_type,
                 "chunks": f.chunks_count,
                 "uploaded_at": f.uploaded_at.isoformat() if f.uploaded_at else None,
-                "vector_store_total": len(documents_store)
+                "vector_store_total": vector_store.live_count
             }
             for f in files
         ]
@@ -238,12 +711,11 @@ def list_ingested_documents() -> List[dict]:
 
 def clear_documents() -> dict:
     """Clear all ingested documents from vector store and database."""
-    global documents_store, document_embeddings
-    documents_store = []
-    document_embeddings = []
-    
-    if VECTOR_STORE_PATH.exists():
-        os.remove(VECTOR_STORE_PATH)
+    vector_store.clear()
+    ann_index.clear()
+    bm25_index.clear()
+    metadata_index.clear()
+    _result_cache.clear()
     
     # Mark all files as inactive in database
     with Session(engine) as session:
@@ -258,3 +730,8 @@ def clear_documents() -> dict:
 
 # Load existing vector store on module import
 load_vector_store()
+if RAG_INDEX_MODE == "ivf":
+    ann_index.update()
+if RAG_HYBRID_SEARCH:
+    bm25_index.update()
+metadata_index.update()
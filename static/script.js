@@ -361,6 +361,7 @@ document.addEventListener("DOMContentLoaded", () => {
       "delete_employee": "🗑️ Deleting employee",
       "delete_project": "🗑️ Deleting project",
       "delete_task": "🗑️ Deleting task",
+      "delete_uploaded_document": "🗑️ Deleting document",
       "clear_uploaded_documents": "🧹 Clearing documents"
     };
 
@@ -436,6 +437,7 @@ document.addEventListener("DOMContentLoaded", () => {
       "delete_employee": "🗑️ Del Emp",
       "delete_project": "🗑️ Del Proj",
       "delete_task": "🗑️ Del Task",
+      "delete_uploaded_document": "🗑️ Delete Doc",
       "clear_uploaded_documents": "🧹 Clear Docs"
     };
 
@@ -1011,6 +1013,32 @@ document.addEventListener("DOMContentLoaded", () => {
   const uploadBtn = document.getElementById("upload-btn");
   const fileInput = document.getElementById("file-input");
 
+  function describeIngestJob(job) {
+    if (job.status === "queued") {
+      return job.queue_position ? `Queued (#${job.queue_position})` : "Queued";
+    }
+    // Pages are parsed and chunks embedded concurrently, so the chunk total is only known at the end
+    const parts = [];
+    if (job.pages_total) {
+      parts.push(`page ${job.pages_parsed}/${job.pages_total}`);
+    }
+    if (job.chunks_embedded) {
+      parts.push(`${job.chunks_embedded} chunks indexed`);
+    }
+    return parts.length ? `Processing: ${parts.join(", ")}` : "Processing";
+  }
+
+  async function waitForIngestJob(jobId, label) {
+    while (true) {
+      const res = await fetch(`/api/upload/jobs/${jobId}`);
+      if (!res.ok) throw new Error(`Job status unavailable (${res.status})`);
+      const job = await res.json();
+      if (["done", "duplicate", "error"].includes(job.status)) return job;
+      label.textContent = describeIngestJob(job);
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+    }
+  }
+
   if (uploadBtn && fileInput) {
     uploadBtn.addEventListener("click", () => {
       fileInput.click();
@@ -1024,7 +1052,9 @@ document.addEventListener("DOMContentLoaded", () => {
       formData.append("file", file);
 
       writeMessage(`📎 Uploading ${file.name}...`, "user");
-      createLoadingIndicator();
+      const loading = createLoadingIndicator();
+      const loadingLabel = loading.querySelector("span");
+      loadingLabel.textContent = "Uploading";
 
       try {
         const res = await fetch("/api/upload", {
@@ -1032,13 +1062,21 @@ document.addEventListener("DOMContentLoaded", () => {
           body: formData
         });
 
-        const result = await res.json();
+        let result = await res.json();
+
+        // Ingestion runs in the background: poll the job until it finishes
+        if (!result.error && result.job_id) {
+          const job = await waitForIngestJob(result.job_id, loadingLabel);
+          result = job.result || { error: job.error || "Ingestion failed" };
+        }
         removeLoadingIndicator();
         
         if (result.error) {
           writeMessage(`❌ Upload failed: ${result.error}`, "bot");
+        } else if (result.status === "duplicate") {
+          writeMessage(`ℹ️ "${result.file}" is identical to "${result.duplicate_of}", which is already indexed. Nothing new to process.`, "bot");
         } else {
-          writeMessage(`✅ Successfully uploaded "${result.file}". Created ${result.chunks_count} searchable chunks.`, "bot");
+          writeMessage(`✅ Successfully uploaded "${result.file}". Created ${result.chunks_created} searchable chunks.`, "bot");
           
           // Auto-ask about the document
           setTimeout(() => {
@@ -0,0 +1,145 @@
+"""Stream Splitter - RecursiveCharacterTextSplitter chunks for text that arrives in pieces.
+
+Produces exactly the chunks of LangChain's RecursiveCharacterTextSplitter
+(default separators, separators kept at the start of the following split,
+whitespace stripped) without holding the whole document. The recursive
+splitter is a left-to-right process: text is cut at the first separator,
+splits shorter than chunk_size are merged greedily, and longer ones are cut
+again at the next separator. Each level here keeps only its unfinished split
+and the chunk being merged, so memory stays O(chunk_size) per level.
+
+A separator that never occurs in a split makes the whole split one piece,
+which the splitter then cuts at the next separator. That matches
+LangChain's choice of the first separator present in the split, so the
+separator can be fixed per level before the text has been seen.
+"""
+
+from collections import deque
+from typing import List, Optional, Tuple
+
+SEPARATORS = ["\n\n", "\n", " ", ""]
+
+Chunk = Tuple[str, int]  # (chunk text, character offset in the document)
+
+
+class _Merger:
+    """Incremental TextSplitter._merge_splits for splits that keep their separator."""
+
+    def __init__(self, chunk_size: int, chunk_overlap: int, out: List[Chunk]):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.out = out
+        self.current = deque()  # (offset, split) pairs of the chunk being built
+        self.total = 0
+
+    def push(self, offset: int, split: str):
+        size = len(split)
+        if self.total + size > self.chunk_size and self.current:
+            self._emit()
+            # Keep the tail that fits in the overlap (and leaves room for this split)
+            while self.total > self.chunk_overlap or (self.total + size > self.chunk_size and self.total > 0):
+                self.total -= len(self.current.popleft()[1])
+        self.current.append((offset, split))
+        self.total += size
+
+    def finish(self):
+        if self.current:
+            self._emit()
+        self.current.clear()
+        self.total = 0
+
+    def _emit(self):
+        text = "".join(split for _, split in self.current)
+        chunk = text.strip()
+        if chunk:
+            self.out.append((chunk, self.current[0][0] + len(text) - len(text.lstrip())))
+
+
+class _Level:
+    """Splits at one separator; splits of chunk_size or more are streamed to the next level."""
+
+    def __init__(self, depth: int, offset: int, chunk_size: int, chunk_overlap: int, out: List[Chunk]):
+        self.depth = depth
+        self.separator = SEPARATORS[depth]
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.out = out
+        self.merger = _Merger(chunk_size, chunk_overlap, out)
+        self.pending = ""       # Text of the current split not yet handed on
+        self.offset = offset    # Document offset of pending[0]
+        self.scan_from = 0      # Where the next separator search in pending starts
+        self.child: Optional["_Level"] = None  # Next level, while the current split is long
+
+    def feed(self, text: str):
+        if not self.separator:
+            # Last level: every character is a split
+            for i, char in enumerate(text):
+                self.merger.push(self.offset + i, char)
+            self.offset += len(text)
+            return
+
+        self.pending += text
+        sep_len = len(self.separator)
+        while True:
+            end = self.pending.find(self.separator, self.scan_from)
+            if end == -1:
+                break
+            self._end_split(self.pending[:end])
+            self.pending = self.pending[end:]
+            self.offset += end
+            self.scan_from = sep_len  # The split starts with its separator
+
+        # No further separator yet; a separator may still begin in the last sep_len - 1 characters
+        settled = max(len(self.pending) - sep_len + 1, self.scan_from)
+        if self.child is None and settled >= self.chunk_size:
+            # The split is already too long to merge: cut it at the next separator instead
+            self.merger.finish()
+            self.child = _Level(self.depth + 1, self.offset, self.chunk_size, self.chunk_overlap, self.out)
+        if self.child is not None and settled > 0:
+            self.child.feed(self.pending[:settled])
+            self.pending = self.pending[settled:]
+            self.offset += settled
+            self.scan_from = 0
+        else:
+            self.scan_from = settled
+
+    def _end_split(self, split: str):
+        if self.child is not None:
+            self.child.feed(split)
+            self.child.close()
+            self.child = None
+        elif len(split) >= self.chunk_size:
+            self.merger.finish()
+            child = _Level(self.depth + 1, self.offset, self.chunk_size, self.chunk_overlap, self.out)
+            child.feed(split)
+            child.close()
+        elif split:
+            self.merger.push(self.offset, split)
+
+    def close(self):
+        if self.separator:
+            self._end_split(self.pending)
+            self.offset += len(self.pending)
+            self.pending = ""
+        self.merger.finish()
+
+
+class StreamSplitter:
+    """Feed document text in order; collect (chunk, start) pairs as they are settled."""
+
+    def __init__(self, chunk_size: int, chunk_overlap: int):
+        self.out: List[Chunk] = []
+        self.root = _Level(0, 0, chunk_size, chunk_overlap, self.out)
+
+    def feed(self, text: str) -> List[Chunk]:
+        self.root.feed(text)
+        return self._drain()
+
+    def finish(self) -> List[Chunk]:
+        self.root.close()
+        return self._drain()
+
+    def _drain(self) -> List[Chunk]:
+        chunks = list(self.out)
+        self.out.clear()
+        return chunks
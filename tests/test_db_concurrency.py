@@ -0,0 +1,108 @@
+"""Streams on the event loop must keep flowing while another connection holds the database write lock.
+
+The FastAPI endpoints use db.async_engine (aiosqlite, WAL), so waiting on a
+busy database happens off the event loop. benchmarks/db_concurrency.py runs
+the same scenario through the full app and reports latencies.
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, create_engine, select
+
+import db
+from models import ChatSession, Conversation, Employee
+
+LOCK_SECONDS = 1.0
+TOKEN_INTERVAL = 0.01
+MAX_STALL = 0.15  # Largest acceptable extra delay between two tokens
+WRITERS = 5
+READERS = 5
+
+
+def hold_write_lock(db_path: str, locked: threading.Event, hold: float):
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute("BEGIN IMMEDIATE")
+    locked.set()
+    time.sleep(hold)
+    conn.execute("COMMIT")
+    conn.close()
+
+
+async def stream_tokens(count: int) -> float:
+    """Yield to the loop like an SSE token stream; returns the largest extra gap between tokens."""
+    stall = 0.0
+    last = time.perf_counter()
+    for _ in range(count):
+        await asyncio.sleep(TOKEN_INTERVAL)
+        now = time.perf_counter()
+        stall = max(stall, now - last - TOKEN_INTERVAL)
+        last = now
+    return stall
+
+
+async def write_message(user_id: int, session_id: int, i: int) -> float:
+    start = time.perf_counter()
+    async with db.async_session() as s:
+        s.add(Conversation(session_id=session_id, user_id=user_id, role="user", content=f"message {i}"))
+        await s.commit()
+    return time.perf_counter() - start
+
+
+async def read_history(user_id: int) -> float:
+    start = time.perf_counter()
+    async with db.async_session() as s:
+        (await s.exec(select(Conversation).where(Conversation.user_id == user_id))).all()
+    return time.perf_counter() - start
+
+
+async def run_under_lock(db_path: str, user_id: int, session_id: int):
+    # Warm the pool so the WAL pragma is set before the lock is taken
+    await read_history(user_id)
+    locked = threading.Event()
+    locker = threading.Thread(target=hold_write_lock, args=(db_path, locked, LOCK_SECONDS))
+    locker.start()
+    await asyncio.get_running_loop().run_in_executor(None, locked.wait)
+
+    stream = asyncio.create_task(stream_tokens(int(LOCK_SECONDS * 1.5 / TOKEN_INTERVAL)))
+    writes = [asyncio.create_task(write_message(user_id, session_id, i)) for i in range(WRITERS)]
+    reads = [asyncio.create_task(read_history(user_id)) for _ in range(READERS)]
+    results = await asyncio.gather(stream, asyncio.gather(*writes), asyncio.gather(*reads))
+    await asyncio.get_running_loop().run_in_executor(None, locker.join)
+    await db.async_engine.dispose()
+    return results
+
+
+def test_stream_not_blocked_by_write_lock(tmp_path, monkeypatch):
+    # Engines configured like db.py's, on a scratch database
+    db_path = str(tmp_path / "corporate.db")
+    monkeypatch.setattr(db, "engine", create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False}))
+    monkeypatch.setattr(db, "async_engine", create_async_engine(f"sqlite+aiosqlite:///{db_path}"))
+    event.listen(db.async_engine.sync_engine, "connect", db._set_sqlite_pragmas)
+    db.init_db()
+    with Session(db.engine) as s:
+        user = Employee(email="test@example.com", full_name="Test", hashed_password="x")
+        s.add(user)
+        s.commit()
+        chat = ChatSession(user_id=user.id, preview="test")
+        s.add(chat)
+        s.commit()
+        user_id, session_id = user.id, chat.id
+    db.engine.dispose()
+
+    try:
+        stall, write_times, read_times = asyncio.run(run_under_lock(db_path, user_id, session_id))
+    finally:
+        db.engine.dispose()
+
+    assert stall < MAX_STALL
+    # Writes waited for the lock off the loop; WAL readers did not wait at all
+    assert min(write_times) > LOCK_SECONDS / 2
+    assert max(read_times) < LOCK_SECONDS / 2
+    with Session(db.engine) as s:
+        assert len(s.exec(select(Conversation)).all()) == WRITERS
+    db.engine.dispose()
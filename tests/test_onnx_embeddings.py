@@ -0,0 +1,61 @@
+"""The int8 ONNX backend must embed like the sentence-transformers model it was exported from.
+
+Skipped unless onnxruntime, tokenizers and langchain_huggingface are installed
+and the model was exported (python onnx_embeddings.py).
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("tokenizers")
+pytest.importorskip("langchain_huggingface")
+
+from config import EMBEDDING_ONNX_DIR, EMBEDDING_ONNX_FILE  # noqa: E402
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+MIN_COSINE = 0.98  # Same bar as benchmarks/embedding_backends.py
+
+SENTENCES = [
+    "How many vacation days do new employees get?",
+    "Server names follow the pattern SRV-<site>-<role>-<number>, e.g. SRV-PAR-DB-01.",
+    "Les notes de frais doivent être soumises avant le 5 du mois suivant.",
+    "Reset your VPN password from the self-service portal.",
+    "x",
+]
+
+
+@pytest.fixture(scope="module")
+def backends():
+    if not (Path(EMBEDDING_ONNX_DIR) / EMBEDDING_ONNX_FILE).exists():
+        pytest.skip(f"{EMBEDDING_ONNX_DIR}/{EMBEDDING_ONNX_FILE} not exported")
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    from onnx_embeddings import OnnxEmbeddings
+    torch_model = HuggingFaceEmbeddings(model_name=MODEL_NAME, model_kwargs={"device": "cpu"})
+    return torch_model, OnnxEmbeddings(EMBEDDING_ONNX_DIR, EMBEDDING_ONNX_FILE)
+
+
+def normalized(vectors) -> np.ndarray:
+    vectors = np.array(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_onnx_matches_torch_embeddings(backends):
+    torch_model, onnx_model = backends
+    reference = normalized(torch_model.embed_documents(SENTENCES))
+    candidate = normalized(onnx_model.embed_documents(SENTENCES))
+    cosines = np.sum(reference * candidate, axis=1)
+    assert cosines.min() >= MIN_COSINE, dict(zip(SENTENCES, cosines.round(4)))
+
+
+def test_onnx_query_ranking_matches_torch(backends):
+    query = "vacation policy for new hires"
+    scores = []
+    for model in backends:
+        documents = normalized(model.embed_documents(SENTENCES))
+        scores.append(documents @ normalized([model.embed_query(query)])[0])
+    assert int(np.argmax(scores[0])) == int(np.argmax(scores[1]))
+    assert np.abs(scores[0] - scores[1]).max() < 0.05
@@ -0,0 +1,71 @@
+"""Streamed chunking must give the same chunks as splitting the whole document at once."""
+
+import random
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from stream_splitter import StreamSplitter
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+
+def random_document(rng: random.Random) -> str:
+    words = ["alpha", "beta", "gamma", "delta", "x", "lorem", "ipsum"] * 10 + ["w" * rng.randint(1, 1500)]
+    parts = []
+    for _ in range(rng.randint(1, 40)):
+        kind = rng.random()
+        if kind < 0.6:
+            # Paragraph of words, sometimes one long line
+            count = rng.choice([rng.randint(1, 60), rng.randint(150, 300)])
+            parts.append(" ".join(rng.choice(words) for _ in range(count)))
+        elif kind < 0.8:
+            parts.append(rng.choice(["\n", "\n\n", "\n\n\n", "\n\n\n\n", "  ", " \n "]))
+        else:
+            parts.append("\n".join(" ".join(rng.choice(words[:-1]) for _ in range(rng.randint(1, 20)))
+                                   for _ in range(rng.randint(1, 40))))
+        parts.append(rng.choice(["\n\n", "\n", " ", ""]))
+    return "".join(parts)
+
+
+def stream(text: str, rng: random.Random):
+    splitter = StreamSplitter(CHUNK_SIZE, CHUNK_OVERLAP)
+    chunks = []
+    position = 0
+    while position < len(text):
+        size = rng.choice([1, 2, 3, rng.randint(1, 50), rng.randint(1, 5000), 64 * 1024])
+        chunks += splitter.feed(text[position:position + size])
+        position += size
+    return chunks + splitter.finish()
+
+
+def test_stream_matches_whole_document_split():
+    reference = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    rng = random.Random(0)
+    for _ in range(200):
+        text = random_document(rng)
+        chunks = stream(text, rng)
+        assert [chunk for chunk, _ in chunks] == reference.split_text(text)
+        for chunk, start in chunks:
+            assert text[start:start + len(chunk)] == chunk
+
+
+def test_stream_across_ingest_window_boundaries():
+    # Long documents fed in 64 KiB reads, as ingestion reads text files
+    reference = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    rng = random.Random(1)
+    for _ in range(10):
+        text = "".join(random_document(rng) for _ in range(5))
+        splitter = StreamSplitter(CHUNK_SIZE, CHUNK_OVERLAP)
+        chunks = []
+        for position in range(0, len(text), 64 * 1024):
+            chunks += splitter.feed(text[position:position + 64 * 1024])
+        chunks += splitter.finish()
+        assert [chunk for chunk, _ in chunks] == reference.split_text(text)
+
+
+def test_empty_and_blank_text():
+    splitter = StreamSplitter(CHUNK_SIZE, CHUNK_OVERLAP)
+    assert splitter.feed("") == []
+    assert splitter.feed(" \n\n \n") == []
+    assert splitter.finish() == []
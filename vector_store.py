@@ -0,0 +1,884 @@
+"""Vector Store - Memory-mapped, segmented storage for chunk embeddings.
+
+Layout of a store directory:
+    manifest.json        committed segments, dimension and generation
+    segments/<name>/     one immutable segment per write:
+        embeddings.f32   contiguous float32 matrix (rows x dim) of unit-length
+                         rows, memory-mapped
+        offsets.u64      byte offset of each row's line in chunks.jsonl
+        chunks.jsonl     one {"text": ..., "metadata": ...} line per row
+        live.u32         only after a purge: local ids of the rows still stored
+        embeddings.i8    optional compressed copy: int8 codes with
+                         per-dimension scales in scales.f32
+    tombstones.u32       append-only ids of deleted rows
+
+add() writes a new segment and then atomically replaces the manifest, so the
+cost of an ingest depends only on its own rows and a crash can never touch
+committed data. compact() merges runs of small adjacent segments; row ids are
+the concatenation of segments in manifest order, so they survive compaction.
+delete() only appends tombstones (searches skip those rows at once);
+compaction later purges deleted rows from the files while keeping every other
+row id unchanged, so indexes built on row ids never need renumbering.
+Every commit bumps the manifest's generation; refresh() remaps only when the
+generation changed.
+
+With compression ("int8") searches scan the compressed copy, which is 4x
+smaller than the float32 matrix, and rescore a shortlist of
+RESCORE_FACTOR * k rows per segment at full precision from the float32 file,
+so only the compressed pages need to stay resident. There is no float16
+mode: NumPy widens float16 in software, which made scans ~9x slower than
+float32, while int8 widens at about float32 speed.
+
+Large stores are searched in parallel: segments are cut into row-range
+shards (views of the memory maps, never copies) scored on a thread pool,
+since NumPy releases the GIL inside the matrix products, and the per-shard
+top-k lists are merged.
+"""
+
+import json
+import os
+import pickle
+import shutil
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+MANIFEST_FILE = "manifest.json"
+SEGMENTS_DIR = "segments"
+EMBEDDINGS_FILE = "embeddings.f32"
+OFFSETS_FILE = "offsets.u64"
+CHUNKS_FILE = "chunks.jsonl"
+LIVE_FILE = "live.u32"
+TOMBSTONES_FILE = "tombstones.u32"
+COMPRESSED_FILES = {"int8": "embeddings.i8"}
+SCALES_FILE = "scales.f32"
+LOCK_FILE = ".lock"
+COMPACT_LOCK_FILE = ".compact.lock"
+FORMAT_VERSION = 3
+
+COMPACT_TARGET_ROWS = 65536     # Segments at or above this size are left alone
+COMPACT_TRIGGER_SEGMENTS = 8    # Compact once this many small segments pile up
+PURGE_MIN_FRACTION = 0.2        # Rewrite a segment once this share of its rows is deleted
+SCAN_BATCH_ROWS = 65536          # Rows gathered per step when scoring a row subset
+DECODE_BATCH_ROWS = 8192        # Compressed rows widened to float32 per step
+RESCORE_FACTOR = 4              # Shortlist size per segment, as a multiple of k
+RESCORE_MIN = 32                # ... and never fewer rows than this
+PARALLEL_MIN_ROWS = 65536       # Smaller stores are scanned inline; thread hand-off would dominate
+SHARD_MIN_ROWS = 16384          # Rows per search shard are at least this many
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale each row of a float32 matrix to unit length."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, via partial selection."""
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(scores, -k)[-k:]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(scores[candidates])[::-1]]
+
+
+def merge_top_k(parts: List[Tuple[np.ndarray, np.ndarray]], k: int) -> List[Tuple[int, float]]:
+    """Merge per-segment (scores, rows) candidates into one best-first top-k."""
+    if not parts:
+        return []
+    scores = np.concatenate([p[0] for p in parts])
+    rows = np.concatenate([p[1] for p in parts])
+    top = top_k_indices(scores, k)
+    return [(int(rows[i]), float(scores[i])) for i in top]
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """Exclusive cross-process lock on a file (fcntl on POSIX, msvcrt on Windows)."""
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _write_json_atomic(path: Path, data: dict):
+    """Write JSON to a temp file and rename it over the target."""
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _write_file(path: Path, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _append_array(path: Path, values: np.ndarray, committed: int):
+    """Append fixed-size values after the first `committed` ones of an append-only file.
+
+    Values past `committed` were written by an update that crashed before
+    its manifest commit, so they are truncated away first.
+    """
+    with open(path, "a+b") as f:
+        f.truncate(committed * values.itemsize)
+        f.seek(0, os.SEEK_END)
+        f.write(values.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _stat_fingerprint(path: Path):
+    """Cheap stat-based identity of a file (no read), or None if it is missing."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _group_rows(codes: np.ndarray, groups: int) -> List[np.ndarray]:
+    """Sorted row ids per code 0..groups-1 of a per-row code array (other codes are skipped)."""
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(groups + 1))
+    return [order[bounds[i]:bounds[i + 1]] for i in range(groups)]
+
+
+def _remove_paths(*paths: Path):
+    """Delete files and directories, ignoring the ones that do not exist."""
+    for path in paths:
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        elif path.exists():
+            os.remove(path)
+
+
+def quantize(matrix: np.ndarray, compression: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """int8 codes of unit-length rows, plus per-dimension scales."""
+    scales = (np.maximum(np.abs(matrix).max(axis=0), 1e-12) / 127).astype(np.float32)
+    return np.clip(np.rint(matrix / scales), -127, 127).astype(np.int8), scales
+
+
+def _write_compressed(directory: Path, matrix: np.ndarray, compression: str):
+    """Write the compressed copy of a segment matrix (codes last, so they mark it complete)."""
+    codes, scales = quantize(np.asarray(matrix, dtype=np.float32), compression)
+    if scales is not None:
+        _write_file(directory / SCALES_FILE, scales.tobytes())
+    tmp_path = directory / f".tmp-{COMPRESSED_FILES[compression]}"
+    _write_file(tmp_path, np.ascontiguousarray(codes).tobytes())
+    os.replace(tmp_path, directory / COMPRESSED_FILES[compression])
+
+
+class Segment:
+    """One immutable, memory-mapped slice of the store.
+
+    Covers row ids [start, start + count). Once compaction has purged deleted
+    rows, only `stored` of them remain and `live` lists their local ids.
+    With compression, `codes` maps the compressed copy (written on first use
+    for segments that predate it).
+    """
+
+    def __init__(self, path: Path, count: int, dim: int, start: int, stored: Optional[int] = None,
+                 compression: Optional[str] = None):
+        self.path = path
+        self.count = count
+        self.start = start
+        self.stored = count if stored is None else stored
+        self.codes = None
+        self.scales = None
+        if not self.stored:
+            # Every row was purged; nothing left to map
+            self.live = np.empty(0, dtype=np.int64)
+            self.embeddings = np.empty((0, dim or 0), dtype=np.float32)
+            self.offsets = np.empty(0, dtype=np.uint64)
+            return
+        self.live = None if stored is None else np.fromfile(path / LIVE_FILE, dtype=np.uint32, count=stored).astype(np.int64)
+        self.embeddings = np.memmap(path / EMBEDDINGS_FILE, dtype=np.float32, mode="r", shape=(self.stored, dim))
+        self.offsets = np.memmap(path / OFFSETS_FILE, dtype=np.uint64, mode="r", shape=(self.stored,))
+        if compression:
+            self._map_compressed(compression, dim)
+
+    def _map_compressed(self, compression: str, dim: int):
+        codes_path = self.path / COMPRESSED_FILES[compression]
+        if not codes_path.exists():
+            try:
+                # Segments are immutable, so concurrent writers produce identical files
+                _write_compressed(self.path, self.embeddings, compression)
+            except OSError as e:
+                # e.g. compaction removed the segment meanwhile; scan float32 instead
+                print(f"[VectorStore] Could not compress {self.path}: {e}")
+                return
+        self.codes = np.memmap(codes_path, dtype=np.int8, mode="r", shape=(self.stored, dim))
+        self.scales = np.fromfile(self.path / SCALES_FILE, dtype=np.float32, count=dim)
+
+    def approximate_scores(self, queries: np.ndarray, positions=None) -> np.ndarray:
+        """(rows x queries) scores against the compressed copy, widened block by block.
+
+        positions: matrix positions (an array or a slice) to score, default all.
+        """
+        codes = self.codes if positions is None else self.codes[positions]
+        if self.scales is not None:
+            # codes * scales @ q == codes @ (q * scales)
+            queries = queries * self.scales
+        scores = np.empty((len(codes), len(queries)), dtype=np.float32)
+        for start in range(0, len(codes), DECODE_BATCH_ROWS):
+            block = np.asarray(codes[start:start + DECODE_BATCH_ROWS], dtype=np.float32)
+            scores[start:start + len(block)] = block @ queries.T
+        return scores
+
+    def local_ids(self, positions: np.ndarray) -> np.ndarray:
+        """Local row ids of matrix positions."""
+        return positions if self.live is None else self.live[positions]
+
+    def positions(self, local_ids: np.ndarray) -> np.ndarray:
+        """Matrix positions of local row ids, -1 where the row was purged."""
+        if self.live is None:
+            return local_ids
+        if not len(self.live):
+            return np.full(len(local_ids), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.live, local_ids), len(self.live) - 1)
+        return np.where(self.live[positions] == local_ids, positions, -1)
+
+    def deleted_positions(self, deleted: np.ndarray) -> np.ndarray:
+        """Matrix positions of stored rows that have been tombstoned."""
+        lo, hi = np.searchsorted(deleted, [self.start, self.start + self.count])
+        positions = self.positions(deleted[lo:hi] - self.start)
+        return positions[positions >= 0]
+
+
+class VectorStore:
+    """Segmented chunk store backed by memory-mapped float32 matrices.
+
+    compression: None or "int8" to scan a compressed copy and
+    rescore the shortlist at full precision. search_threads: shards scanned
+    concurrently per search (0 = one per CPU, 1 = inline).
+    """
+
+    def __init__(self, path: Path, compression: Optional[str] = None, search_threads: int = 0):
+        if compression in ("", "none"):
+            compression = None
+        if compression is not None and compression not in COMPRESSED_FILES:
+            raise ValueError(f"Unknown compression {compression!r}. Use: none, {', '.join(COMPRESSED_FILES)}")
+        self.path = Path(path)
+        self.compression = compression
+        self.rescore_factor = RESCORE_FACTOR
+        self.search_threads = search_threads or os.cpu_count() or 1
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self.dim: Optional[int] = None
+        self.count = 0
+        self.segments: List[Segment] = []
+        self.deleted = np.empty(0, dtype=np.int64)  # Sorted tombstoned row ids
+        self.generation: Optional[int] = None
+        self.stats = {"hits": 0, "reloads": 0}
+        self._fingerprint = None
+        self._write_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Number of row ids handed out, including deleted rows."""
+        return self.count
+
+    @property
+    def live_count(self) -> int:
+        """Number of rows that have not been deleted."""
+        return self.count - len(self.deleted)
+
+    # ---------- Reading ----------
+
+    def _read_manifest(self) -> dict:
+        manifest_path = self.path / MANIFEST_FILE
+        if not manifest_path.exists():
+            return {"segments": []}
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _manifest_fingerprint(self):
+        return _stat_fingerprint(self.path / MANIFEST_FILE)
+
+    def exists(self) -> bool:
+        """Whether a committed store is present on disk."""
+        return (self.path / MANIFEST_FILE).exists()
+
+    def load(self):
+        """Map the committed segments into memory (zero-copy)."""
+        self._fingerprint = self._manifest_fingerprint()
+        self._map(self._read_manifest())
+
+    def refresh(self) -> bool:
+        """Remap only if another writer committed a new generation.
+
+        Returns True when the store was reloaded, False on a cache hit.
+        """
+        fingerprint = self._manifest_fingerprint()
+        if self.generation is not None and fingerprint == self._fingerprint:
+            self.stats["hits"] += 1
+            return False
+
+        manifest = self._read_manifest()
+        self._fingerprint = fingerprint
+        if self.generation is not None and manifest.get("generation", 0) == self.generation:
+            self.stats["hits"] += 1
+            return False
+
+        self._map(manifest)
+        self.stats["reloads"] += 1
+        return True
+
+    def _map(self, manifest: dict):
+        self.generation = manifest.get("generation", 0)
+        self.dim = manifest.get("dim")
+
+        segments = []
+        start = 0
+        for entry in manifest.get("segments", []):
+            segments.append(Segment(self.path / entry["path"], entry["count"], self.dim, start, entry.get("stored"),
+                                    self.compression))
+            start += entry["count"]
+        # Readers take one snapshot of self.segments, so a concurrent reload
+        # (e.g. after background compaction) can never mix two layouts
+        self.segments = segments
+        self.count = start
+        self.deleted = self._read_tombstones(manifest)
+
+    def _read_tombstones(self, manifest: dict) -> np.ndarray:
+        count = manifest.get("tombstones", 0)
+        if not count:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.fromfile(self.path / TOMBSTONES_FILE, dtype=np.uint32, count=count).astype(np.int64))
+
+    def is_deleted(self, rows) -> np.ndarray:
+        """Boolean mask of which row ids have been deleted."""
+        rows = np.asarray(rows, dtype=np.int64)
+        deleted = self.deleted
+        if not len(deleted):
+            return np.zeros(len(rows), dtype=bool)
+        positions = np.minimum(np.searchsorted(deleted, rows), len(deleted) - 1)
+        return deleted[positions] == rows
+
+    @staticmethod
+    def _segment_of(segments: List[Segment], rows: np.ndarray) -> np.ndarray:
+        starts = np.array([segment.start for segment in segments], dtype=np.int64)
+        return np.searchsorted(starts, rows, side="right") - 1
+
+    def embedding_rows(self, rows) -> np.ndarray:
+        """Gather the stored vectors for arbitrary (not purged) row ids."""
+        segments = self.segments
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.empty((len(rows), self.dim or 0), dtype=np.float32)
+        segment_ids = self._segment_of(segments, rows)
+        for s in np.unique(segment_ids):
+            mask = segment_ids == s
+            segment = segments[s]
+            out[mask] = segment.embeddings[segment.positions(rows[mask] - segment.start)]
+        return out
+
+    def _approximate_row_scores(self, segments: List[Segment], rows: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """(rows x queries) scores of arbitrary row ids against the compressed copies."""
+        out = np.empty((len(rows), len(queries)), dtype=np.float32)
+        segment_ids = self._segment_of(segments, rows)
+        for s in np.unique(segment_ids):
+            mask = segment_ids == s
+            segment = segments[s]
+            positions = segment.positions(rows[mask] - segment.start)
+            if segment.codes is not None:
+                out[mask] = segment.approximate_scores(queries, positions)
+            else:
+                out[mask] = segment.embeddings[positions] @ queries.T
+        return out
+
+    def embedding_block(self, start: int, stop: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Row ids and vectors of the rows still stored in the range [start, stop)."""
+        rows, parts = [], []
+        for segment in self.segments:
+            lo = max(start, segment.start)
+            hi = min(stop, segment.start + segment.count)
+            if lo < hi:
+                local = np.arange(lo - segment.start, hi - segment.start)
+                positions = segment.positions(local)
+                if segment.live is not None:
+                    positions = positions[positions >= 0]
+                    local = segment.local_ids(positions)
+                rows.append(local + segment.start)
+                parts.append(segment.embeddings[positions[0]:positions[-1] + 1] if len(positions) else segment.embeddings[:0])
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.dim or 0), dtype=np.float32)
+        if len(parts) == 1:
+            return rows[0], parts[0]
+        return np.concatenate(rows), np.concatenate(parts)
+
+    def stored_rows(self, start: int, stop: int) -> np.ndarray:
+        """Ids of the rows in [start, stop) that have not been purged."""
+        return self.embedding_block(start, stop)[0]
+
+    def get_chunks(self, rows: List[int]) -> List[Tuple[str, dict]]:
+        """Read (text, metadata) for the given row ids from the segment sidecars."""
+        try:
+            return self._read_chunks(self.segments, rows)
+        except FileNotFoundError:
+            # Compaction removed segments we still had mapped; row ids are unchanged
+            self.refresh()
+            return self._read_chunks(self.segments, rows)
+
+    def _read_chunks(self, segments: List[Segment], rows: List[int]) -> List[Tuple[str, dict]]:
+        results = []
+        handles = {}
+        try:
+            for row, s in zip(rows, self._segment_of(segments, np.asarray(rows, dtype=np.int64))):
+                segment = segments[s]
+                if s not in handles:
+                    handles[s] = open(segment.path / CHUNKS_FILE, "rb")
+                f = handles[s]
+                position = int(segment.positions(np.array([row - segment.start]))[0])
+                if position < 0:
+                    raise KeyError(f"Row {row} has been purged")
+                f.seek(int(segment.offsets[position]))
+                record = json.loads(f.readline())
+                results.append((record["text"], record["metadata"]))
+        finally:
+            for f in handles.values():
+                f.close()
+        return results
+
+    def iter_rows(self):
+        """Yield (row, text, metadata) for every row that has not been deleted, in order."""
+        deleted = self.deleted
+        for segment in self.segments:
+            if not segment.stored:
+                continue
+            rows = segment.local_ids(np.arange(segment.stored)) + segment.start
+            dead = set(segment.deleted_positions(deleted).tolist())
+            with open(segment.path / CHUNKS_FILE, "rb") as f:
+                for position, row in enumerate(rows):
+                    line = f.readline()
+                    if position not in dead:
+                        record = json.loads(line)
+                        yield int(row), record["text"], record["metadata"]
+
+    def iter_chunks(self):
+        """Yield (text, metadata) for every row that has not been deleted, in order."""
+        for _, text, metadata in self.iter_rows():
+            yield text, metadata
+
+    def search(self, query_embedding, k: int = 5) -> List[Tuple[int, float]]:
+        """Return (row, cosine score) pairs for the k rows closest to the query."""
+        return self.search_batch([query_embedding], k)[0]
+
+    def search_batch(self, query_embeddings, k: int = 5) -> List[List[Tuple[int, float]]]:
+        """Score many queries with one matrix-matrix product per shard, shards in parallel."""
+        queries = normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        candidates = [[] for _ in range(len(queries))]
+        deleted = self.deleted
+        shards = self._shards(self.segments)
+
+        def search_shard(shard):
+            return self._search_shard(*shard, queries, k, deleted)
+
+        if len(shards) > 1 and self.search_threads > 1 and sum(hi - lo for _, lo, hi in shards) >= PARALLEL_MIN_ROWS:
+            results = self._get_executor().map(search_shard, shards)
+        else:
+            results = map(search_shard, shards)
+        for shard_results in results:
+            for q, part in enumerate(shard_results):
+                candidates[q].append(part)
+
+        return [merge_top_k(parts, k) for parts in candidates]
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.search_threads,
+                                                        thread_name_prefix="vector-search")
+        return self._executor
+
+    def _shards(self, segments: List[Segment]) -> List[Tuple[Segment, int, int]]:
+        """Split segments into (segment, lo, hi) matrix-position ranges, about one per search thread."""
+        total = sum(segment.stored for segment in segments)
+        shard_rows = max(SHARD_MIN_ROWS, -(-total // self.search_threads))
+        return [(segment, lo, min(lo + shard_rows, segment.stored))
+                for segment in segments
+                for lo in range(0, segment.stored, shard_rows)]
+
+    def _search_shard(self, segment: Segment, lo: int, hi: int, queries: np.ndarray, k: int,
+                      deleted: np.ndarray) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Per-query (scores, rows) top-k of matrix positions [lo, hi) of one segment."""
+        compressed = segment.codes is not None
+        if compressed:
+            similarities = segment.approximate_scores(queries, slice(lo, hi))
+        else:
+            # (rows x dim) @ (dim x n_queries): rows are already unit length
+            similarities = segment.embeddings[lo:hi] @ queries.T
+        dead = segment.deleted_positions(deleted)
+        dead = dead[(dead >= lo) & (dead < hi)] - lo
+        if len(dead):
+            # Tombstoned rows drop out of results until compaction purges them
+            similarities[dead] = -np.inf
+
+        results = []
+        for q, column in enumerate(similarities.T):
+            top = top_k_indices(column, self._shortlist(k) if compressed else k)
+            top = top[np.isfinite(column[top])]
+            positions, scores = top + lo, column[top]
+            if compressed:
+                positions, scores = self._rescore(segment.embeddings, positions, queries[q], k)
+            results.append((scores, segment.local_ids(positions) + segment.start))
+        return results
+
+    def _shortlist(self, k: int) -> int:
+        return max(k * self.rescore_factor, RESCORE_MIN)
+
+    @staticmethod
+    def _rescore(matrix: np.ndarray, positions: np.ndarray, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact scores of shortlisted rows of a float32 matrix; returns the best k (positions, scores)."""
+        positions = np.sort(positions)  # Read the memory map front to back
+        scores = np.asarray(matrix[positions], dtype=np.float32) @ query
+        best = top_k_indices(scores, k)
+        return positions[best], scores[best]
+
+    def search_rows(self, query_embeddings, rows, k: int = 5) -> List[List[Tuple[int, float]]]:
+        """Score only the given row ids (pre-filtered search); cost scales with len(rows)."""
+        queries = normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        rows = np.asarray(rows, dtype=np.int64)
+        rows = rows[~self.is_deleted(rows)]
+        candidates = [[] for _ in range(len(queries))]
+        segments = self.segments
+        compressed = any(segment.codes is not None for segment in segments)
+
+        for start in range(0, len(rows), SCAN_BATCH_ROWS):
+            block_rows = rows[start:start + SCAN_BATCH_ROWS]
+            if compressed:
+                similarities = self._approximate_row_scores(segments, block_rows, queries)
+            else:
+                similarities = self.embedding_rows(block_rows) @ queries.T
+            for q, column in enumerate(similarities.T):
+                if compressed:
+                    top = top_k_indices(column, self._shortlist(k))
+                    shortlist = np.sort(block_rows[top])
+                    scores = self.embedding_rows(shortlist) @ queries[q]
+                    best = top_k_indices(scores, k)
+                    candidates[q].append((scores[best], shortlist[best]))
+                else:
+                    top = top_k_indices(column, k)
+                    candidates[q].append((column[top], block_rows[top]))
+
+        return [merge_top_k(parts, k) for parts in candidates]
+
+    # ---------- Writing ----------
+
+    def _write_segment(self, name: str, texts: List[str], metadatas: List[dict], matrix: np.ndarray) -> int:
+        """Write a complete segment directory, renamed into place only once durable."""
+        segments_dir = self.path / SEGMENTS_DIR
+        tmp_dir = segments_dir / f".tmp-{name}"
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        tmp_dir.mkdir(parents=True)
+
+        lines = [
+            (json.dumps({"text": text, "metadata": meta}, ensure_ascii=False) + "\n").encode("utf-8")
+            for text, meta in zip(texts, metadatas)
+        ]
+        offsets = np.zeros(len(lines), dtype=np.uint64)
+        offsets[1:] = np.cumsum([len(line) for line in lines[:-1]], dtype=np.uint64)
+
+        _write_file(tmp_dir / CHUNKS_FILE, b"".join(lines))
+        _write_file(tmp_dir / OFFSETS_FILE, offsets.tobytes())
+        _write_file(tmp_dir / EMBEDDINGS_FILE, np.ascontiguousarray(matrix).tobytes())
+        if self.compression:
+            _write_compressed(tmp_dir, matrix, self.compression)
+        os.replace(tmp_dir, segments_dir / name)
+        return sum(len(line) for line in lines)
+
+    def add(self, texts: List[str], metadatas: List[dict], embeddings) -> range:
+        """Append rows as a new immutable segment. Returns the row ids they were given."""
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if len(texts) == 0:
+            return range(self.count, self.count)
+        if matrix.ndim != 2 or matrix.shape[0] != len(texts) or len(metadatas) != len(texts):
+            raise ValueError("texts, metadatas and embeddings must have the same length")
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self._write_lock, _file_lock(self.path / LOCK_FILE):
+            # Another process may have committed since we last loaded
+            manifest = self._read_manifest()
+            dim = manifest.get("dim") or matrix.shape[1]
+            if matrix.shape[1] != dim:
+                raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match store dimension {dim}")
+
+            segment_number = manifest.get("next_segment", 1)
+            name = f"{segment_number:06d}"
+            # Normalize once here so queries need a single dot product
+            chunks_bytes = self._write_segment(name, texts, metadatas, normalize_rows(matrix))
+
+            first_row = sum(entry["count"] for entry in manifest["segments"])
+            segments = manifest["segments"] + [
+                {"path": f"{SEGMENTS_DIR}/{name}", "count": len(texts), "chunks_bytes": chunks_bytes}
+            ]
+            self._commit(manifest, segments, dim=int(dim), next_segment=segment_number + 1)
+
+        self.load()
+        return range(first_row, first_row + len(texts))
+
+    def delete(self, rows) -> int:
+        """Tombstone rows so searches skip them at once. Returns how many were newly deleted.
+
+        Costs O(len(rows)): ids are appended to tombstones.u32 and the
+        manifest is re-committed. Compaction reclaims the space later.
+        """
+        rows = np.unique(np.asarray(list(rows), dtype=np.int64))
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self._write_lock, _file_lock(self.path / LOCK_FILE):
+            manifest = self._read_manifest()
+            count = sum(entry["count"] for entry in manifest["segments"])
+            tombstones = manifest.get("tombstones", 0)
+            rows = rows[(rows >= 0) & (rows < count)]
+            rows = rows[~np.isin(rows, self._read_tombstones(manifest))]
+            if not len(rows):
+                return 0
+            _append_array(self.path / TOMBSTONES_FILE, rows.astype(np.uint32), tombstones)
+            self._commit(manifest, manifest["segments"], tombstones=tombstones + len(rows))
+
+        self.load()
+        return len(rows)
+
+    def _commit(self, manifest: dict, segments: List[dict], **changes):
+        """Atomically publish a new segment list as the next generation."""
+        _write_json_atomic(self.path / MANIFEST_FILE, {
+            "version": FORMAT_VERSION,
+            "generation": manifest.get("generation", 0) + 1,
+            "dim": manifest.get("dim"),
+            "next_segment": manifest.get("next_segment", 1),
+            "tombstones": manifest.get("tombstones", 0),
+            **changes,
+            "count": sum(entry["count"] for entry in segments),
+            "segments": segments,
+        })
+
+    # ---------- Compaction ----------
+
+    def _compaction_runs(self, segments: List[dict], dead: List[int]) -> List[Tuple[int, int]]:
+        """Group adjacent segments worth rewriting into [start, stop) runs.
+
+        Small segments are merged with their neighbours; a segment with at
+        least PURGE_MIN_FRACTION of its rows deleted is rewritten even alone.
+        """
+        runs = []
+        run, rows = [], 0
+
+        def close():
+            if len(run) > 1 or any(self._needs_purge(segments[i], dead[i]) for i in run):
+                runs.append((run[0], run[-1] + 1))
+
+        for i, entry in enumerate(segments):
+            size = entry.get("stored", entry["count"]) - dead[i]
+            candidate = size < COMPACT_TARGET_ROWS or self._needs_purge(entry, dead[i])
+            if run and (not candidate or rows + size > COMPACT_TARGET_ROWS):
+                close()
+                run, rows = [], 0
+            if candidate:
+                run.append(i)
+                rows += size
+        if run:
+            close()
+        return runs
+
+    @staticmethod
+    def _needs_purge(entry: dict, dead: int) -> bool:
+        return dead > 0 and dead >= PURGE_MIN_FRACTION * entry.get("stored", entry["count"])
+
+    def _dead_counts(self, segments: List[Segment]) -> List[int]:
+        """Stored-but-deleted rows per segment."""
+        return [len(segment.deleted_positions(self.deleted)) for segment in segments]
+
+    def needs_compaction(self) -> bool:
+        """Whether enough small segments or deleted rows have accumulated to be worth rewriting."""
+        small = sum(1 for segment in self.segments if segment.stored < COMPACT_TARGET_ROWS)
+        if small >= COMPACT_TRIGGER_SEGMENTS:
+            return True
+        return any(dead and dead >= PURGE_MIN_FRACTION * segment.stored
+                   for segment, dead in zip(self.segments, self._dead_counts(self.segments)))
+
+    def compact(self) -> dict:
+        """Merge runs of small adjacent segments and purge deleted rows without blocking writers.
+
+        Rewritten segments are built outside the write lock (inputs are
+        immutable) and swapped in with a single manifest commit. Row ids are
+        unchanged because only adjacent segments are merged, in order, and
+        purged rows keep their ids (they simply stop being stored).
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        merged = 0
+        purged = 0
+        with _file_lock(self.path / COMPACT_LOCK_FILE):
+            with self._write_lock, _file_lock(self.path / LOCK_FILE):
+                manifest = self._read_manifest()
+                self._map(manifest)
+                snapshot = self.segments
+                runs = self._compaction_runs(manifest["segments"], self._dead_counts(snapshot))
+                # Reserve segment names so concurrent adds never collide with ours
+                first_name = manifest.get("next_segment", 1)
+                if runs:
+                    _write_json_atomic(self.path / MANIFEST_FILE, {
+                        **manifest, "next_segment": first_name + len(runs)
+                    })
+
+            built = []
+            for i, (start, stop) in enumerate(runs):
+                name = f"{first_name + i:06d}"
+                entries = manifest["segments"][start:stop]
+                merged_entry = self._merge_segments(name, snapshot[start:stop])
+                purged += sum(entry.get("stored", entry["count"]) for entry in entries) - merged_entry.get("stored", merged_entry["count"])
+                built.append((entries, merged_entry))
+
+            with self._write_lock, _file_lock(self.path / LOCK_FILE):
+                current = self._read_manifest()
+                segments = list(current["segments"])
+                for entries, merged_entry in built:
+                    # Adds only ever append, so the run is still in place
+                    position = segments.index(entries[0])
+                    segments[position:position + len(entries)] = [merged_entry]
+                    merged += len(entries)
+                if built:
+                    self._commit(current, segments)
+                self._remove_unreferenced(segments)
+
+        self.load()
+        return {
+            "status": "compacted" if merged else "nothing_to_do",
+            "segments_merged": merged,
+            "rows_purged": purged,
+            "segments": len(self.segments),
+        }
+
+    def _merge_segments(self, name: str, sources: List[Segment]) -> dict:
+        """Concatenate segments into one, dropping rows that were deleted."""
+        segments_dir = self.path / SEGMENTS_DIR
+        tmp_dir = segments_dir / f".tmp-{name}"
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        tmp_dir.mkdir(parents=True)
+
+        base = 0
+        span = 0
+        live = []
+        with open(tmp_dir / CHUNKS_FILE, "wb") as chunks_out, \
+                open(tmp_dir / OFFSETS_FILE, "wb") as offsets_out, \
+                open(tmp_dir / EMBEDDINGS_FILE, "wb") as embeddings_out:
+            for segment in sources:
+                keep = np.ones(segment.stored, dtype=bool)
+                keep[segment.deleted_positions(self.deleted)] = False
+                live.append(segment.local_ids(np.flatnonzero(keep)) + span)
+                span += segment.count
+                if not keep.any():
+                    continue
+                if keep.all():
+                    with open(segment.path / CHUNKS_FILE, "rb") as f:
+                        shutil.copyfileobj(f, chunks_out)
+                    offsets_out.write((np.asarray(segment.offsets) + np.uint64(base)).tobytes())
+                    with open(segment.path / EMBEDDINGS_FILE, "rb") as f:
+                        shutil.copyfileobj(f, embeddings_out)
+                    base += os.path.getsize(segment.path / CHUNKS_FILE)
+                    continue
+                with open(segment.path / CHUNKS_FILE, "rb") as f:
+                    chunks = f.read()
+                ends = np.append(np.asarray(segment.offsets[1:], dtype=np.int64), len(chunks))
+                offsets = []
+                for position in np.flatnonzero(keep):
+                    line = chunks[int(segment.offsets[position]):int(ends[position])]
+                    offsets.append(base)
+                    chunks_out.write(line)
+                    base += len(line)
+                offsets_out.write(np.array(offsets, dtype=np.uint64).tobytes())
+                embeddings_out.write(np.ascontiguousarray(segment.embeddings[keep]).tobytes())
+            for f in (chunks_out, offsets_out, embeddings_out):
+                f.flush()
+                os.fsync(f.fileno())
+
+        live = np.concatenate(live) if live else np.empty(0, dtype=np.int64)
+        if self.compression and len(live):
+            # Quantization scales are recomputed over the merged rows
+            stored = np.memmap(tmp_dir / EMBEDDINGS_FILE, dtype=np.float32, mode="r", shape=(len(live), self.dim))
+            _write_compressed(tmp_dir, stored, self.compression)
+            del stored
+        entry = {"path": f"{SEGMENTS_DIR}/{name}", "count": span, "chunks_bytes": base}
+        if len(live) < span:
+            _write_file(tmp_dir / LIVE_FILE, live.astype(np.uint32).tobytes())
+            entry["stored"] = len(live)
+        os.replace(tmp_dir, segments_dir / name)
+        return entry
+
+    def _remove_unreferenced(self, segments: List[dict]):
+        """Delete segment files no manifest points at (merged inputs, crashed writes).
+
+        Must be called holding both locks. Readers that still map a removed
+        segment keep working on POSIX; on Windows the delete is retried later.
+        """
+        referenced = {entry["path"] for entry in segments}
+        segments_dir = self.path / SEGMENTS_DIR
+        if segments_dir.exists():
+            for child in segments_dir.iterdir():
+                if f"{SEGMENTS_DIR}/{child.name}" not in referenced:
+                    shutil.rmtree(child, ignore_errors=True)
+
+    def clear(self):
+        """Remove every row from the store."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        with _file_lock(self.path / COMPACT_LOCK_FILE):
+            with self._write_lock, _file_lock(self.path / LOCK_FILE):
+                # Commit an empty manifest first so readers stop seeing the rows
+                self._commit(self._read_manifest(), [], dim=None, tombstones=0)
+                self._remove_unreferenced([])
+                if (self.path / TOMBSTONES_FILE).exists():
+                    os.remove(self.path / TOMBSTONES_FILE)
+        self.load()
+
+
+def migrate_from_pickle(pickle_path: Path, store_path: Path) -> dict:
+    """One-shot conversion of a legacy vector_store.pkl into a VectorStore."""
+    store = VectorStore(store_path)
+    if store.exists():
+        return {"status": "skipped", "message": f"{store_path} already exists"}
+
+    with open(pickle_path, "rb") as f:
+        data = pickle.load(f)
+    documents = data.get("documents", [])
+    embeddings = data.get("embeddings", [])
+    if len(documents) != len(embeddings):
+        return {"error": f"Pickle has {len(documents)} documents but {len(embeddings)} embeddings"}
+
+    store.add(
+        [doc.page_content for doc in documents],
+        [dict(doc.metadata) for doc in documents],
+        embeddings,
+    )
+    return {"status": "migrated", "rows": len(store), "path": str(store_path)}
+
+
+if __name__ == "__main__":
+    # Usage: python vector_store.py [vector_store.pkl] [vector_store]
+    source = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("vector_store.pkl")
+    target = Path(sys.argv[2]) if len(sys.argv) > 2 else Path("vector_store")
+    print(migrate_from_pickle(source, target))